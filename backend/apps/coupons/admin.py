@@ -1,13 +1,55 @@
 from django.contrib import admin
-from .models import Coupon
+from django.contrib import messages
+from .models import Coupon, CouponUsageShard
+
+
+def ativar_contador_fragmentado(modeladmin, request, queryset):
+    """
+    Divide os usos dos cupons selecionados em 16 shards (campanhas).
+    """
+    coupons = list(queryset.filter(sharded_usage=False))
+    for coupon in coupons:
+        coupon.enable_sharding(shards=16)
+    
+    messages.success(
+        request,
+        f'✅ Usos de {len(coupons)} cupom(ns) divididos em 16 shards.'
+    )
+
+ativar_contador_fragmentado.short_description = '🔀 Ativar contador fragmentado (16 shards)'
+
+
+def desativar_contador_fragmentado(modeladmin, request, queryset):
+    """
+    Junta os shards de volta em um único contador de usos.
+    """
+    coupons = list(queryset.filter(sharded_usage=True))
+    for coupon in coupons:
+        coupon.disable_sharding()
+    
+    messages.success(
+        request,
+        f'✅ Contador fragmentado desativado em {len(coupons)} cupom(ns).'
+    )
+
+desativar_contador_fragmentado.short_description = '↩️ Desativar contador fragmentado'
+
+
+class CouponUsageShardInline(admin.TabularInline):
+    model = CouponUsageShard
+    extra = 0
+    readonly_fields = ['index', 'used', 'quota']
+    can_delete = False
 
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
-    list_display = ['code', 'discount_type', 'discount_value', 'used_count', 'max_uses', 'valid_until', 'is_active']
-    list_filter = ['discount_type', 'is_active', 'valid_from', 'valid_until']
+    list_display = ['code', 'discount_type', 'discount_value', 'used_count', 'max_uses', 'valid_until', 'is_active', 'sharded_usage']
+    list_filter = ['discount_type', 'is_active', 'sharded_usage', 'valid_from', 'valid_until']
     search_fields = ['code', 'description']
-    readonly_fields = ['used_count', 'created_at', 'updated_at']
+    readonly_fields = ['used_count', 'sharded_usage', 'created_at', 'updated_at']
+    actions = [ativar_contador_fragmentado, desativar_contador_fragmentado]
+    inlines = [CouponUsageShardInline]
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('code', 'description', 'is_active')
@@ -16,7 +58,7 @@ class CouponAdmin(admin.ModelAdmin):
             'fields': ('discount_type', 'discount_value', 'min_purchase')
         }),
         ('Limite de Uso', {
-            'fields': ('max_uses', 'used_count')
+            'fields': ('max_uses', 'used_count', 'sharded_usage')
         }),
         ('Validade', {
             'fields': ('valid_from', 'valid_until')
@@ -0,0 +1,156 @@
+"""
+Cache de cupons por código (validate_coupon sem consultar o banco)
+
+Cada processo guarda os cupons já consultados por código normalizado
+(maiúsculas), com TTL, inclusive os códigos inexistentes. Um filtro de Bloom
+com todos os códigos rejeita códigos desconhecidos (tentativas de adivinhar)
+sem ir ao banco e sem ocupar o cache.
+
+Qualquer escrita em Coupon incrementa a versão dos cupons após o commit;
+na próxima consulta cada processo descarta o cache e remonta o filtro. A
+versão fica no cache compartilhado do Django (Redis ou tabela no banco),
+como a do catálogo. O filtro também vence com o TTL: um código fora de um
+filtro vencido é conferido no banco (filtro remontado) antes de ser
+recusado, então uma versão perdida não recusa cupons novos para sempre.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Upper
+
+VERSION_KEY = 'coupons:version'
+
+# Taxa de falso positivo do filtro (código inexistente que ainda consulta o banco)
+BLOOM_ERROR_RATE = 0.01
+
+
+def normalize(code):
+    return code.strip().upper()
+
+
+def coupons_version():
+    """Versão atual dos cupons (cresce a cada escrita confirmada)"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_coupons_version():
+    """Invalida os caches de cupons quando a transação atual confirmar"""
+    transaction.on_commit(_increment_version)
+
+
+def _increment_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        coupons_version()
+        cache.incr(VERSION_KEY)
+
+
+class BloomFilter:
+    """Conjunto aproximado: sem falso negativo, ~error_rate de falso positivo"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Duplo hashing: k posições a partir de um único digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * step) % self.size for index in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class CouponCache:
+    """Cupons por código normalizado: código -> (expira_em, cupom ou None)"""
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.bloom = None
+        self.bloom_expires = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, code):
+        """Cupom com o código (sem diferença de maiúsculas) ou None"""
+        from .models import Coupon
+
+        key = normalize(code)
+        version = coupons_version()
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.bloom = None
+                self.version = version
+            bloom = self.bloom
+
+        now = time.monotonic()
+        if bloom is None:
+            bloom = self.build_bloom(version)
+        elif key not in bloom and self.bloom_expires <= now:
+            # Filtro vencido: recusa só depois de conferir no banco
+            bloom = self.build_bloom(version)
+        if key not in bloom:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        # UPPER(code) = %s: mesma expressão do índice coupon_code_upper_idx
+        coupon = (
+            Coupon.objects.annotate(code_upper=Upper('code'))
+            .filter(code_upper=key)
+            .order_by('id')
+            .first()
+        )
+
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = (now + self.ttl, coupon)
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return coupon
+
+    def build_bloom(self, version):
+        from .models import Coupon
+
+        codes = Coupon.objects.annotate(code_upper=Upper('code')).order_by().values_list('code_upper', flat=True)
+        bloom = BloomFilter(codes.count())
+        for code in codes.iterator():
+            bloom.add(code)
+
+        with self.lock:
+            if version == self.version:
+                self.bloom = bloom
+                self.bloom_expires = time.monotonic() + self.ttl
+        return bloom
+
+
+coupon_cache = CouponCache(
+    ttl=settings.COUPON_CACHE['TTL_SECONDS'],
+    max_entries=settings.COUPON_CACHE['MAX_ENTRIES'],
+)
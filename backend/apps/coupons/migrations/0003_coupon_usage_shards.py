@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0002_coupon_code_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='sharded_usage',
+            field=models.BooleanField(default=False, help_text='Divide os usos em vários contadores (CouponUsageShard) para campanhas com muitos checkouts simultâneos', verbose_name='Contador Fragmentado'),
+        ),
+        migrations.CreateModel(
+            name='CouponUsageShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Índice')),
+                ('used', models.PositiveIntegerField(default=0, verbose_name='Usos')),
+                ('quota', models.PositiveIntegerField(blank=True, null=True, verbose_name='Cota')),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_shards', to='coupons.coupon', verbose_name='Cupom')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Usos',
+                'verbose_name_plural': 'Fragmentos de Usos',
+                'constraints': [models.UniqueConstraint(fields=('coupon', 'index'), name='coupon_usage_shard_index_uniq')],
+            },
+        ),
+    ]
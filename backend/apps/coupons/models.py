@@ -1,6 +1,75 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Upper
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from mercadofree_backend.deferred import DeferredSync
+from .cache import bump_coupons_version
+
+
+class CouponUnavailable(Exception):
+    """O cupom não pode ser usado no pedido (mensagem para o cliente)"""
+
+
+class CouponQuerySet(models.QuerySet):
+    """
+    Escritas em lote invalidam o cache de cupons (apps.coupons.cache)
+    (save/delete de instâncias ficam no próprio modelo)
+    """
+    
+    def update(self, **kwargs):
+        bump_coupons_version()
+        return super().update(**kwargs)
+    
+    def delete(self):
+        bump_coupons_version()
+        return super().delete()
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        bump_coupons_version()
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        bump_coupons_version()
+        return super().bulk_update(objs, fields, *args, **kwargs)
+    
+    def update_usage(self, used_count):
+        """
+        Grava used_count sem invalidar o cache de cupons: o limite é
+        conferido no próprio UPDATE do resgate, então um contador
+        desatualizado no cache não libera usos a mais
+        """
+        return super().update(used_count=used_count)
+
+
+class CouponManager(models.Manager.from_queryset(CouponQuerySet)):
+    """
+    Manager de cupons com devolução de usos em lote
+    """
+    
+    def release(self, counts):
+        """
+        Devolve usos de pedidos cancelados {coupon_id: quantidade} em um UPDATE
+        Cupons com contador fragmentado devolvem a um shard
+        """
+        counts = {pk: count for pk, count in counts.items() if pk and count}
+        if not counts:
+            return 0
+        
+        sharded = set(self.filter(id__in=counts.keys(), sharded_usage=True).values_list('id', flat=True))
+        for pk in sharded:
+            CouponUsageShard.objects.restore(pk, counts.pop(pk))
+        if not counts:
+            return len(sharded)
+        
+        return len(sharded) + self.filter(id__in=counts.keys()).update_usage(
+            F('used_count') - Case(
+                *[When(id=pk, then=Value(count)) for pk, count in counts.items()],
+                default=Value(0),
+                output_field=models.IntegerField()
+            )
+        )
 
 
 class Coupon(models.Model):
@@ -62,6 +131,11 @@ class Coupon(models.Model):
         default=True,
         verbose_name='Ativo'
     )
+    sharded_usage = models.BooleanField(
+        default=False,
+        verbose_name='Contador Fragmentado',
+        help_text='Divide os usos em vários contadores (CouponUsageShard) para campanhas com muitos checkouts simultâneos'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Criado em'
@@ -71,16 +145,56 @@ class Coupon(models.Model):
         verbose_name='Atualizado em'
     )
     
+    objects = CouponManager()
+    
     class Meta:
         verbose_name = 'Cupom'
         verbose_name_plural = 'Cupons'
         ordering = ['-created_at']
+        indexes = [
+            # Busca por código sem diferença de maiúsculas (apps.coupons.cache)
+            models.Index(Upper('code'), name='coupon_code_upper_idx'),
+        ]
     
     def __str__(self):
         return f"{self.code} - {self.get_discount_display()}"
     
-    def is_valid(self):
-        """Verifica se o cupom está válido"""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda o limite carregado para detectar edições"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_max_uses = instance.__dict__.get('max_uses')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """
+        used_count só muda pelos UPDATEs atômicos (redeem/release): salvar o
+        cupom não sobrescreve usos feitos por checkouts concorrentes
+        Em contador fragmentado, um novo max_uses é redistribuído entre os shards
+        Invalida o cache de cupons após o commit (inclusive toggle_active)
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'used_count'
+            ]
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.sharded_usage and self.max_uses != getattr(self, '_loaded_max_uses', self.max_uses):
+                CouponUsageShard.objects.rebalance(self)
+            bump_coupons_version()
+        self._loaded_max_uses = self.max_uses
+    
+    def delete(self, *args, **kwargs):
+        bump_coupons_version()
+        return super().delete(*args, **kwargs)
+    
+    def is_valid(self, check_uses=True):
+        """
+        Verifica se o cupom está válido
+        `check_uses=False` deixa o limite de usos para o UPDATE de redeem
+        """
         now = timezone.now()
         
         # Verificar se está ativo
@@ -95,7 +209,7 @@ class Coupon(models.Model):
             return False, "Cupom expirado"
         
         # Verificar limite de usos
-        if self.max_uses and self.used_count >= self.max_uses:
+        if check_uses and self.max_uses and self.used_count >= self.max_uses:
             return False, "Limite de usos atingido"
         
         return True, "Cupom válido"
@@ -137,7 +251,180 @@ class Coupon(models.Model):
             'coupon_code': self.code
         }, "Cupom aplicado com sucesso"
     
+    def discount_for(self, total_amount):
+        """
+        Desconto do cupom em um pedido, sem usá-lo
+        Levanta CouponUnavailable; o limite de usos é conferido em redeem
+        """
+        is_valid, message = self.is_valid(check_uses=False)
+        if not is_valid:
+            raise CouponUnavailable(message)
+        
+        if total_amount < self.min_purchase:
+            raise CouponUnavailable(f"Compra mínima de R$ {self.min_purchase:.2f} não atingida")
+        
+        return self.calculate_discount(total_amount).quantize(Decimal('0.01'))
+    
+    def redeem(self):
+        """
+        Usa o cupom uma vez, na transação atual, sem ler-modificar-gravar:
+        UPDATE ... SET used_count = used_count + 1 WHERE used_count < max_uses
+        Com contador fragmentado, o uso sai de um shard aleatório
+        Levanta CouponUnavailable quando o limite foi atingido
+        """
+        if self.sharded_usage:
+            redeemed = CouponUsageShard.objects.take(self.pk)
+        else:
+            redeemed = (
+                Coupon.objects.filter(pk=self.pk, is_active=True)
+                .filter(Q(max_uses__isnull=True) | Q(used_count__lt=F('max_uses')))
+                .update_usage(F('used_count') + 1)
+            )
+        
+        if not redeemed:
+            raise CouponUnavailable("Limite de usos atingido")
+    
     def increment_usage(self):
-        """Incrementa o contador de usos"""
-        self.used_count += 1
-        self.save()
+        """Incrementa o contador de usos (atômico, ver redeem)"""
+        self.redeem()
+    
+    def enable_sharding(self, shards=16):
+        """Divide os usos e o limite do cupom em `shards` contadores"""
+        with transaction.atomic():
+            coupon = Coupon.objects.select_for_update().get(pk=self.pk)
+            CouponUsageShard.objects.filter(coupon_id=self.pk).delete()
+            CouponUsageShard.objects.bulk_create([
+                CouponUsageShard(coupon_id=self.pk, index=index, used=0)
+                for index in range(shards)
+            ])
+            Coupon.objects.filter(pk=self.pk).update(sharded_usage=True)
+            self.sharded_usage = True
+            CouponUsageShard.objects.rebalance(self, used=coupon.used_count)
+    
+    def disable_sharding(self):
+        """Junta os shards de volta no campo `used_count`"""
+        with transaction.atomic():
+            shards = CouponUsageShard.objects.select_for_update().filter(coupon_id=self.pk)
+            used = shards.aggregate(total=Sum('used'))['total'] or 0
+            shards.delete()
+            Coupon.objects.filter(pk=self.pk).update(sharded_usage=False, used_count=used)
+            self.sharded_usage = False
+            self.used_count = used
+
+
+def split(total, parts):
+    """`total` dividido em `parts` partes quase iguais"""
+    base, extra = divmod(total, parts)
+    return [base + (1 if position < extra else 0) for position in range(parts)]
+
+
+class CouponUsageShardManager(models.Manager):
+    """
+    Contador de usos fragmentado: checkouts concorrentes do mesmo cupom
+    atualizam shards diferentes em vez de disputar a linha do cupom
+    """
+    
+    def take(self, coupon_id):
+        """
+        Um uso de um shard aleatório que ainda tenha usos livres
+        Shards bloqueados por outros checkouts são pulados (SKIP LOCKED); só se
+        eles não bastarem, espera pelos demais. Retorna False se esgotou ou se
+        o cupom foi desativado
+        """
+        for skip_locked in (True, False):
+            shard_id = (
+                self.select_for_update(skip_locked=skip_locked, of=('self',))
+                .filter(coupon_id=coupon_id, coupon__is_active=True)
+                .filter(Q(quota__isnull=True) | Q(used__lt=F('quota')))
+                .order_by('?')
+                .values_list('id', flat=True)
+                .first()
+            )
+            if shard_id is not None:
+                self.filter(id=shard_id).update(used=F('used') + 1)
+                self.schedule_sync([coupon_id])
+                return True
+        return False
+    
+    def restore(self, coupon_id, count):
+        """Devolve `count` usos, tirando de shards aleatórios"""
+        remaining = count
+        while remaining > 0:
+            shard = self.filter(coupon_id=coupon_id, used__gt=0).order_by('?').first()
+            if shard is None:
+                break
+            returned = min(shard.used, remaining)
+            if self.filter(id=shard.id, used__gte=returned).update(used=F('used') - returned):
+                remaining -= returned
+        self.schedule_sync([coupon_id])
+    
+    def rebalance(self, coupon, used=None):
+        """
+        Redistribui os usos e o limite (max_uses) igualmente entre os shards
+        `used` substitui o total de usos atual (ativação do contador fragmentado)
+        """
+        with transaction.atomic():
+            shards = list(self.select_for_update().filter(coupon_id=coupon.pk).order_by('index'))
+            if not shards:
+                return
+            
+            if used is None:
+                used = sum(shard.used for shard in shards)
+            quotas = split(coupon.max_uses, len(shards)) if coupon.max_uses is not None else [None] * len(shards)
+            for shard, shard_used, quota in zip(shards, split(used, len(shards)), quotas):
+                shard.used = shard_used
+                shard.quota = quota
+            self.bulk_update(shards, ['used', 'quota'])
+            
+            Coupon.objects.filter(pk=coupon.pk).update_usage(used)
+    
+    def schedule_sync(self, coupon_ids):
+        """
+        Atualiza Coupon.used_count com a soma dos shards após o commit,
+        agrupando os cupons alterados em um UPDATE a cada
+        SHARD_SYNC['INTERVAL_MS'] (mercadofree_backend.deferred)
+        """
+        usage_sync.schedule(coupon_ids)
+    
+    def sync(self, coupon_ids):
+        totals = (
+            self.filter(coupon_id=OuterRef('pk'))
+            .values('coupon_id')
+            .annotate(total=Sum('used'))
+            .values('total')
+        )
+        return Coupon.objects.filter(id__in=coupon_ids, sharded_usage=True).update_usage(
+            Coalesce(Subquery(totals), 0)
+        )
+
+
+class CouponUsageShard(models.Model):
+    """
+    Contador parcial de usos de um cupom com contador fragmentado
+    `quota` é a parte de max_uses deste shard (nulo: ilimitado);
+    Coupon.used_count guarda a soma dos shards para leitura
+    """
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.CASCADE,
+        related_name='usage_shards',
+        verbose_name='Cupom'
+    )
+    index = models.PositiveSmallIntegerField(verbose_name='Índice')
+    used = models.PositiveIntegerField(default=0, verbose_name='Usos')
+    quota = models.PositiveIntegerField(null=True, blank=True, verbose_name='Cota')
+    
+    objects = CouponUsageShardManager()
+    
+    class Meta:
+        verbose_name = 'Fragmento de Usos'
+        verbose_name_plural = 'Fragmentos de Usos'
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'index'], name='coupon_usage_shard_index_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.coupon.code} #{self.index}: {self.used}/{'∞' if self.quota is None else self.quota}"
+
+
+usage_sync = DeferredSync(lambda coupon_ids: CouponUsageShard.objects.sync(coupon_ids))
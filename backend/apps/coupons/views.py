@@ -2,6 +2,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .cache import coupon_cache
 from .models import Coupon
 from .serializers import CouponSerializer, ValidateCouponSerializer
 
@@ -24,16 +25,17 @@ class CouponViewSet(viewsets.ModelViewSet):
     def validate_coupon(self, request):
         """
         Valida um cupom para um determinado valor de compra
+        Servido do cache de cupons: códigos inexistentes são recusados pelo
+        filtro de Bloom e cupons já consultados vêm da memória (sem consultas)
         """
         serializer = ValidateCouponSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        code = serializer.validated_data['code'].upper()
+        code = serializer.validated_data['code']
         total_amount = serializer.validated_data['total_amount']
         
-        try:
-            coupon = Coupon.objects.get(code__iexact=code)
-        except Coupon.DoesNotExist:
+        coupon = coupon_cache.get(code)
+        if coupon is None:
             return Response(
                 {'error': 'Cupom não encontrado'},
                 status=status.HTTP_404_NOT_FOUND
@@ -58,6 +60,7 @@ class CouponViewSet(viewsets.ModelViewSet):
     def toggle_active(self, request, pk=None):
         """
         Ativa/desativa um cupom
+        O save invalida o cache de cupons de todos os processos
         """
         coupon = self.get_object()
         coupon.is_active = not coupon.is_active
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib import messages
-from django.db.models import F
-from .models import Order, OrderItem, OrderStatusHistory
+from .models import ArchivedOrder, Order, OrderItem, OrderStatusHistory
+from .tasks import purge_orders
 
 
 def limpar_todos_pedidos(modeladmin, request, queryset):
@@ -18,20 +18,8 @@ def limpar_todos_pedidos(modeladmin, request, queryset):
         messages.warning(request, '⚠️ Não há pedidos para limpar.')
         return
     
-    # Devolver produtos ao estoque
-    products_updated = 0
-    for order in Order.objects.prefetch_related('items__product').all():
-        for item in order.items.all():
-            item.product.stock = F('stock') + item.quantity
-            item.product.save()
-            products_updated += 1
-    
-    # Deletar histórico
-    OrderStatusHistory.objects.all().delete()
-    
-    # Deletar itens e pedidos
-    OrderItem.objects.all().delete()
-    Order.objects.all().delete()
+    # Devolve estoque com um GROUP BY por produto e limpa com TRUNCATE (PostgreSQL)
+    _, products_updated = purge_orders(truncate=True)
     
     messages.success(
         request,
@@ -47,16 +35,7 @@ def devolver_estoque_pedidos_selecionados(modeladmin, request, queryset):
     """
     Devolve produtos ao estoque e deleta apenas os pedidos selecionados.
     """
-    count = queryset.count()
-    products_updated = 0
-    
-    for order in queryset.prefetch_related('items__product'):
-        for item in order.items.all():
-            item.product.stock = F('stock') + item.quantity
-            item.product.save()
-            products_updated += 1
-    
-    queryset.delete()
+    count, products_updated = purge_orders(queryset)
     
     messages.success(
         request,
@@ -76,7 +55,7 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'status', 'total_amount', 'pickup_code', 'created_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['user__username', 'pickup_code']
+    search_fields = ['user__username', '=pickup_code']
     readonly_fields = ['pickup_code', 'created_at', 'updated_at']
     inlines = [OrderItemInline]
     actions = [limpar_todos_pedidos, devolver_estoque_pedidos_selecionados]
@@ -89,3 +68,11 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'price', 'subtotal']
     readonly_fields = ['subtotal']
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['id', 'user__username']
+    readonly_fields = ['id', 'user', 'status', 'total_amount', 'created_at', 'archived_at', 'data']
@@ -0,0 +1,375 @@
+"""
+Checkout: reserva de estoque e criação de pedidos
+Sistema: quem compra primeiro leva o produto
+
+place_order atende um pedido por transação. Com ORDER_INTAKE['BATCHING']
+ligado, OrderIntake junta os checkouts que chegam em poucos milissegundos e
+place_orders resolve o lote inteiro em uma transação (group commit).
+
+O cupom (coupon_code) é aplicado na mesma transação: o desconto é calculado
+a partir do cache de cupons e o uso é contado por um UPDATE condicional
+(Coupon.redeem), deixado para o fim para segurar a linha do cupom o mínimo.
+"""
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from decimal import Decimal
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from apps.coupons.cache import coupon_cache
+from apps.coupons.models import CouponUnavailable
+from apps.products.models import InsufficientStock, Product, StockShard
+from .models import (
+    RESERVATION_TIME, Order, OrderItem, OrderStatusHistory, PickupCode, PickupCodeUnavailable
+)
+
+
+class CheckoutError(Exception):
+    """Pedido recusado; `status_code` é o status HTTP da resposta"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def requested_quantities(items_data):
+    """Quantidade total por produto (linhas repetidas somam)"""
+    requested = {}
+    for item_data in items_data:
+        product_id = item_data['product_id']
+        requested[product_id] = requested.get(product_id, 0) + item_data['quantity']
+    return requested
+
+
+def lock_products(product_ids):
+    """
+    SELECT FOR UPDATE único, em ordem de id (evita deadlock entre checkouts)
+    Estoque fragmentado: a linha do produto não é bloqueada, a reserva vai aos shards
+    """
+    products = {
+        product.id: product
+        for product in Product.objects.select_for_update().filter(
+            id__in=product_ids,
+            is_active=True,
+            sharded_stock=False
+        ).order_by('id')
+    }
+
+    missing = set(product_ids) - products.keys()
+    if missing:
+        products.update(
+            (product.id, product)
+            for product in Product.objects.filter(id__in=missing, is_active=True, sharded_stock=True)
+        )
+    return products
+
+
+def reserve(requested, products, available):
+    """
+    Reserva o estoque de um pedido
+    `available` é o estoque restante dos produtos bloqueados (atualizado aqui)
+    Levanta CheckoutError com os produtos indisponíveis
+    """
+    for product_id in requested:
+        if product_id not in products:
+            raise CheckoutError(f"Produto {product_id} não encontrado ou inativo.")
+
+    # Verificação de estoque sobre o mesmo snapshot bloqueado
+    unavailable_products = [
+        {
+            'name': products[product_id].name,
+            'requested': quantity,
+            'available': available[product_id]
+        }
+        for product_id, quantity in requested.items()
+        if not products[product_id].sharded_stock and available[product_id] < quantity
+    ]
+
+    sharded = {
+        product_id: quantity
+        for product_id, quantity in requested.items()
+        if products[product_id].sharded_stock
+    }
+    if sharded:
+        # Savepoint: qualquer falta desfaz todas as retiradas dos shards
+        with transaction.atomic():
+            for product_id, quantity in sharded.items():
+                try:
+                    StockShard.objects.take(product_id, quantity)
+                except InsufficientStock as e:
+                    unavailable_products.append({
+                        'name': products[product_id].name,
+                        'requested': quantity,
+                        'available': e.available
+                    })
+            if unavailable_products:
+                transaction.set_rollback(True)
+
+    # Se algum produto não está disponível, retorna erro detalhado
+    if unavailable_products:
+        error_msg = "Produtos indisponíveis:\n"
+        for item in unavailable_products:
+            if item['available'] == 0:
+                error_msg += f"• {item['name']}: ESGOTADO (outra pessoa comprou antes)\n"
+            else:
+                error_msg += f"• {item['name']}: Solicitado {item['requested']}, disponível {item['available']}\n"
+        raise CheckoutError(error_msg.strip())
+
+    for product_id, quantity in requested.items():
+        if product_id in available:
+            available[product_id] -= quantity
+
+
+def build_items(order, items_data, products):
+    return [
+        OrderItem(
+            order=order,
+            product=products[item_data['product_id']],
+            quantity=item_data['quantity'],
+            price=products[item_data['product_id']].price
+        )
+        for item_data in items_data
+    ]
+
+
+def total_amount(items_data, products):
+    return sum(
+        products[item_data['product_id']].price * item_data['quantity']
+        for item_data in items_data
+    )
+
+
+def coupon_discount(code, total):
+    """
+    (cupom, desconto) do código informado no checkout, sem usar o cupom
+    Levanta CheckoutError se o cupom não existe ou não vale para o pedido
+    """
+    if not code:
+        return None, Decimal('0.00')
+
+    coupon = coupon_cache.get(code)
+    if coupon is None:
+        raise CheckoutError('Cupom não encontrado.')
+    try:
+        return coupon, coupon.discount_for(total)
+    except CouponUnavailable as e:
+        raise CheckoutError(f'Cupom {coupon.code}: {e}.')
+
+
+def redeem_coupon(coupon):
+    """Conta o uso do cupom na transação atual (UPDATE condicional)"""
+    try:
+        coupon.redeem()
+    except CouponUnavailable as e:
+        raise CheckoutError(f'Cupom {coupon.code}: {e}.', status_code=409)
+
+
+def consumed_stock(products, available):
+    """Variações de estoque dos produtos bloqueados para um único UPDATE"""
+    return {
+        product_id: available[product_id] - product.stock
+        for product_id, product in products.items()
+        if not product.sharded_stock
+    }
+
+
+@transaction.atomic
+def place_order(user, data):
+    """
+    Cria um pedido com controle de concorrência
+    `data` é o validated_data do CreateOrderSerializer
+    """
+    items_data = data['items']
+    requested = requested_quantities(items_data)
+    products = lock_products(requested.keys())
+    available = {pk: product.stock for pk, product in products.items() if not product.sharded_stock}
+
+    reserve(requested, products, available)
+    total = total_amount(items_data, products)
+    coupon, discount = coupon_discount(data.get('coupon_code'), total)
+
+    # Criar pedido
+    try:
+        order = Order.objects.create(
+            user=user,
+            total_amount=total - discount,
+            coupon=coupon,
+            discount_amount=discount,
+            notes=data.get('notes', ''),
+            payment_method=data.get('payment_method', 'pix'),
+            installments=data.get('installments', 1),
+            status='pending'  # Inicia como pendente
+        )
+    except PickupCodeUnavailable as e:
+        raise CheckoutError(str(e), status_code=503)
+
+    # Criar items em lote e RESERVAR estoque com um único UPDATE
+    OrderItem.objects.bulk_create(build_items(order, items_data, products))
+    Product.objects.adjust_stock(consumed_stock(products, available))
+
+    # Por último: a linha do cupom fica bloqueada só até o commit
+    if coupon is not None:
+        redeem_coupon(coupon)
+
+    return order
+
+
+@transaction.atomic
+def place_orders(entries):
+    """
+    Resolve um lote de checkouts [(user, data), ...] em uma transação
+    Estoque alocado por ordem de chegada; pedidos, itens, históricos e
+    estoque gravados em lote. Retorna, na mesma ordem, Order ou CheckoutError
+    """
+    requested = [requested_quantities(data['items']) for _, data in entries]
+    products = lock_products(set().union(*requested))
+    available = {pk: product.stock for pk, product in products.items() if not product.sharded_stock}
+
+    # Códigos livres para o lote inteiro (quem passar do limite recebe 503)
+    codes = PickupCode.objects.claim(len(entries), partial=True)
+
+    results = []
+    accepted = []
+    for (user, data), quantities in zip(entries, requested):
+        if len(accepted) == len(codes):
+            results.append(CheckoutError('Todos os códigos de retirada estão em uso.', status_code=503))
+            continue
+        try:
+            total = total_amount(data['items'], products)
+            coupon, discount = coupon_discount(data.get('coupon_code'), total)
+            # Savepoint: se faltar estoque, o uso do cupom é desfeito
+            with transaction.atomic() if coupon is not None else nullcontext():
+                if coupon is not None:
+                    redeem_coupon(coupon)
+                reserve(quantities, products, available)
+        except CheckoutError as e:
+            results.append(e)
+            continue
+
+        order = Order(
+            user=user,
+            total_amount=total - discount,
+            coupon=coupon,
+            discount_amount=discount,
+            notes=data.get('notes', ''),
+            payment_method=data.get('payment_method', 'pix'),
+            installments=data.get('installments', 1),
+            status='pending',
+            expires_at=timezone.now() + RESERVATION_TIME,
+            pickup_code=codes[len(accepted)]
+        )
+        accepted.append((order, data['items']))
+        results.append(order)
+
+    if accepted:
+        orders = Order.objects.bulk_create([order for order, _ in accepted])
+        PickupCode.objects.bind(orders)
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order=order, status='pending') for order in orders
+        ])
+        OrderItem.objects.bulk_create([
+            item
+            for order, items_data in accepted
+            for item in build_items(order, items_data, products)
+        ])
+        Product.objects.adjust_stock(consumed_stock(products, available))
+
+    return results
+
+
+class OrderIntake:
+    """
+    Fila de admissão de pedidos (group commit)
+    Cada requisição entra na fila e espera; uma thread coletora junta os
+    checkouts de uma janela curta e resolve todos em uma única transação
+    Só agrupa requisições simultâneas do mesmo processo: requer workers com
+    threads (gunicorn gthread, runserver); com workers sync o lote tem sempre 1
+    """
+
+    class Entry:
+        def __init__(self, user, data):
+            self.user = user
+            self.data = data
+            self.result = None
+            self.abandoned = False
+            self.done = threading.Event()
+
+    def __init__(self, window_ms=5, max_batch=100, timeout_ms=10000):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, user, data):
+        """
+        Enfileira um checkout e bloqueia até o lote ser gravado
+        Sem resposta em `timeout` (coletora parada ou travada): CheckoutError 503
+        """
+        self.start()
+        entry = self.Entry(user, data)
+        self.queue.put(entry)
+        if not entry.done.wait(self.timeout):
+            with self.lock:
+                # Ainda na fila: a coletora descarta. Já no lote: o pedido
+                # pode ser gravado e expira sem pagamento como qualquer outro
+                entry.abandoned = True
+            raise CheckoutError(
+                'Não foi possível confirmar o pedido agora. Tente novamente em instantes.',
+                status_code=503
+            )
+
+        if isinstance(entry.result, Exception):
+            raise entry.result
+        return entry.result
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='order-intake', daemon=True)
+                self.thread.start()
+
+    def collect(self, batch):
+        """Preenche `batch` com os checkouts da janela (ignora os abandonados)"""
+        batch.append(self.queue.get())
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        with self.lock:
+            batch[:] = [entry for entry in batch if not entry.abandoned]
+
+    def run(self):
+        while True:
+            batch = []
+            try:
+                self.collect(batch)
+                if not batch:
+                    continue
+                close_old_connections()
+                results = place_orders([(entry.user, entry.data) for entry in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError('place_orders devolveu um resultado por pedido a menos')
+            except Exception as e:
+                # Nenhum checkout retirado da fila fica sem resposta
+                results = [e] * len(batch)
+
+            for entry, result in zip(batch, results):
+                entry.result = result
+                entry.done.set()
+
+
+intake = OrderIntake(
+    window_ms=settings.ORDER_INTAKE['WINDOW_MS'],
+    max_batch=settings.ORDER_INTAKE['MAX_BATCH'],
+    timeout_ms=settings.ORDER_INTAKE['TIMEOUT_MS'],
+)
@@ -0,0 +1,72 @@
+"""
+Suporte ao cabeçalho Idempotency-Key nos POSTs de criação
+Retentativas do cliente (timeout, clique duplo) com a mesma chave
+recebem a resposta original sem reservar estoque de novo
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def idempotent(scope):
+    """
+    Decorator para actions de ViewSet
+    A requisição original e a gravação da resposta rodam na mesma transação;
+    uma duplicata concorrente espera por ela e repete a resposta gravada
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            
+            key_hash = _sha256(f'{request.user.pk}:{scope}:{key}')
+            fingerprint = _sha256(json.dumps(request.data, sort_keys=True, default=str))
+            ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            
+            with transaction.atomic():
+                record = IdempotencyKey.objects.claim(key_hash, fingerprint, ttl)
+                
+                if record is not None:
+                    if record.fingerprint != fingerprint:
+                        return Response(
+                            {'error': 'Idempotency-Key já usada com outra requisição.'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                        )
+                    if record.status_code is None:
+                        return Response(
+                            {'error': 'Requisição original ainda em processamento.'},
+                            status=status.HTTP_409_CONFLICT
+                        )
+                    return Response(
+                        record.response_body,
+                        status=record.status_code,
+                        headers={'Idempotent-Replayed': 'true'}
+                    )
+                
+                response = view_method(self, request, *args, **kwargs)
+                
+                # Erros de servidor liberam a chave para uma nova tentativa
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                    return response
+                
+                IdempotencyKey.objects.filter(key_hash=key_hash).update(
+                    status_code=response.status_code,
+                    response_body=response.data
+                )
+            
+            return response
+        return wrapper
+    return decorator
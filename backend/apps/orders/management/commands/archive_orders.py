@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.orders.tasks import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move pedidos concluídos/cancelados antigos para o arquivo (ArchivedOrder)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help=f'Idade mínima do pedido em dias (padrão: {settings.ORDER_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Pedidos arquivados por transação (padrão: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+
+        def progress(archived, total):
+            self.stdout.write(
+                self.style.SUCCESS(f'  ✓ {archived}/{total} pedidos arquivados')
+            )
+
+        count = archive_orders(older_than, batch_size=options['batch_size'], progress=progress)
+
+        if count > 0:
+            self.stdout.write(
+                self.style.SUCCESS(f'\n✅ {count} pedido(s) com mais de {options["days"]} dias arquivado(s)!')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('✅ Nenhum pedido para arquivar.')
+            )
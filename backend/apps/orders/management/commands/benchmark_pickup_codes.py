@@ -0,0 +1,67 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.orders.models import Order, PickupCode
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência de criação de pedidos conforme o pool de códigos de retirada enche. '
+        'Roda dentro de uma transação desfeita ao final: nenhum dado é gravado'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--occupancy',
+            type=float,
+            default=99.0,
+            help='Ocupação final do pool em %% (padrão: 99)',
+        )
+        parser.add_argument(
+            '--buckets',
+            type=int,
+            default=10,
+            help='Faixas de ocupação no relatório (padrão: 10)',
+        )
+
+    def handle(self, *args, **options):
+        total = PickupCode.objects.count()
+        if not total:
+            self.stdout.write(self.style.ERROR('❌ Pool de códigos vazio. Execute as migrations.'))
+            return
+
+        with transaction.atomic():
+            user, _ = get_user_model().objects.get_or_create(username='benchmark_pickup_codes')
+            used = PickupCode.objects.filter(order__isnull=False).count()
+            target = int(total * options['occupancy'] / 100)
+
+            self.stdout.write(
+                f'⏱️  Criando {max(0, target - used)} pedidos '
+                f'(pool: {used}/{total} → {target}/{total})...\n'
+            )
+
+            bucket_size = max(1, (target - used) // options['buckets'])
+            latencies = []
+            while used < target:
+                start = time.perf_counter()
+                Order.objects.create(user=user, total_amount=0)
+                latencies.append(time.perf_counter() - start)
+                used += 1
+
+                if len(latencies) == bucket_size or used == target:
+                    self.report(used, total, latencies)
+                    latencies = []
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)'))
+
+    def report(self, used, total, latencies):
+        latencies.sort()
+        avg = sum(latencies) / len(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'  ocupação {used / total * 100:5.1f}% | '
+            f'média {avg * 1000:6.2f} ms | p99 {p99 * 1000:6.2f} ms'
+        )
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
-from apps.orders.models import Order, OrderItem, OrderStatusHistory
+from django.db import connection
+from apps.orders.models import Order, OrderStatusHistory
+from apps.orders.tasks import purge_orders
 from apps.payments.models import Payment
 
 
@@ -12,6 +14,17 @@ class Command(BaseCommand):
             action='store_true',
             help='Confirma a ação de resetar todos os pedidos',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Pedidos deletados por transação (padrão: 5000)',
+        )
+        parser.add_argument(
+            '--truncate',
+            action='store_true',
+            help='Usa TRUNCATE em uma única transação (apenas PostgreSQL)',
+        )
 
     def handle(self, *args, **options):
         if not options['confirm']:
@@ -32,41 +45,20 @@ class Command(BaseCommand):
         total_payments = Payment.objects.count()
         total_history = OrderStatusHistory.objects.count()
 
-        # Devolver produtos ao estoque
-        orders_with_items = Order.objects.prefetch_related('items__product').all()
-        products_updated = 0
-
-        for order in orders_with_items:
-            for item in order.items.all():
-                # Devolver ao estoque
-                item.product.stock += item.quantity
-                item.product.save()
-                products_updated += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'  ✓ Devolvido {item.quantity}x {item.product.name} ao estoque'
-                    )
-                )
-
-        # Deletar histórico de status
-        OrderStatusHistory.objects.all().delete()
-        self.stdout.write(
-            self.style.SUCCESS(f'\n✓ {total_history} registros de histórico deletados')
-        )
+        if options['truncate'] and connection.vendor != 'postgresql':
+            self.stdout.write(
+                self.style.WARNING('⚠️  --truncate exige PostgreSQL; usando deleção em lotes.')
+            )
 
-        # Deletar pagamentos
-        Payment.objects.all().delete()
-        self.stdout.write(
-            self.style.SUCCESS(f'✓ {total_payments} pagamentos deletados')
-        )
+        def progress(deleted, total):
+            self.stdout.write(
+                self.style.SUCCESS(f'  ✓ {deleted}/{total} pedidos deletados ({deleted / total * 100:.0f}%)')
+            )
 
-        # Deletar itens de pedidos (cascade)
-        OrderItem.objects.all().delete()
-        
-        # Deletar pedidos
-        Order.objects.all().delete()
-        self.stdout.write(
-            self.style.SUCCESS(f'✓ {total_orders} pedidos deletados')
+        _, products_updated = purge_orders(
+            chunk_size=options['chunk_size'],
+            truncate=options['truncate'],
+            progress=progress,
         )
 
         self.stdout.write(
@@ -0,0 +1,160 @@
+import heapq
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.orders.models import IdempotencyKey, Order
+from apps.orders.tasks import claim_expired_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker residente que cancela pedidos pendentes no instante em que expiram. '
+        'Pode rodar em várias instâncias simultâneas (FOR UPDATE SKIP LOCKED)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Máximo de pedidos cancelados por transação (padrão: 500)',
+        )
+        parser.add_argument(
+            '--refresh-interval',
+            type=float,
+            default=1.0,
+            help='Segundos entre buscas de novos pedidos pendentes (padrão: 1)',
+        )
+        parser.add_argument(
+            '--resync-interval',
+            type=float,
+            default=60.0,
+            help='Segundos entre reconstruções completas da fila de prazos (padrão: 60)',
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            default=60.0,
+            help='Segundos entre relatórios de atraso acumulado (padrão: 60)',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # Fila de prazos em memória: (expires_at, order_id)
+        self.heap = []
+        self.scheduled = set()
+        self.last_seen_id = 0
+
+        # Métricas de atraso (quanto tempo após expires_at o cancelamento ocorreu)
+        self.stats = {'cancelled': 0, 'lag_total': 0.0, 'lag_max': 0.0}
+
+        self.stdout.write(self.style.SUCCESS('⏰ Worker de expiração iniciado'))
+
+        next_refresh = next_resync = next_stats = 0.0
+        while self.running:
+            close_old_connections()
+            now = time.monotonic()
+
+            if now >= next_resync:
+                self.resync()
+                next_resync = now + options['resync_interval']
+                next_refresh = now + options['refresh_interval']
+            elif now >= next_refresh:
+                self.refresh()
+                next_refresh = now + options['refresh_interval']
+
+            if self.heap and self.heap[0][0] <= timezone.now():
+                self.expire_due()
+
+            if now >= next_stats:
+                self.report()
+                next_stats = now + options['stats_interval']
+
+            # Dorme até o próximo prazo ou a próxima busca, o que vier primeiro
+            wake_at = next_refresh
+            if self.heap:
+                until_deadline = (self.heap[0][0] - timezone.now()).total_seconds()
+                wake_at = min(wake_at, time.monotonic() + max(0.0, until_deadline))
+            self.sleep(wake_at - time.monotonic())
+
+        self.report()
+        self.stdout.write(self.style.SUCCESS('✅ Worker de expiração finalizado'))
+
+    def stop(self, signum, frame):
+        self.running = False
+
+    def sleep(self, seconds):
+        # Fatias curtas para responder rápido a SIGTERM
+        deadline = time.monotonic() + seconds
+        while self.running and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
+
+    def schedule(self, rows):
+        for order_id, expires_at in rows:
+            self.last_seen_id = max(self.last_seen_id, order_id)
+            if expires_at and order_id not in self.scheduled:
+                self.scheduled.add(order_id)
+                heapq.heappush(self.heap, (expires_at, order_id))
+
+    def pending_orders(self):
+        return Order.objects.filter(status='pending').values_list('id', 'expires_at')
+
+    def refresh(self):
+        """Incremental: só pedidos criados após a última busca"""
+        self.schedule(self.pending_orders().filter(id__gt=self.last_seen_id).order_by('id'))
+
+    def resync(self):
+        """
+        Reconstrução completa: descarta pedidos já pagos/cancelados
+        e recupera pedidos cujo commit chegou fora da ordem de id
+        Aproveita para remover chaves de idempotência vencidas
+        """
+        IdempotencyKey.objects.evict_expired()
+        self.heap = []
+        self.scheduled = set()
+        self.schedule(self.pending_orders().order_by('id'))
+
+    def expire_due(self):
+        now = timezone.now()
+        while self.heap and self.heap[0][0] <= now:
+            _, order_id = heapq.heappop(self.heap)
+            self.scheduled.discard(order_id)
+
+        # Reivindica em lotes até não restar pedido expirado livre
+        while self.running:
+            claimed = claim_expired_orders(limit=self.batch_size)
+            if not claimed:
+                break
+
+            cancelled_at = timezone.now()
+            lags = [(cancelled_at - expires_at).total_seconds() for _, expires_at in claimed]
+            self.stats['cancelled'] += len(claimed)
+            self.stats['lag_total'] += sum(lags)
+            self.stats['lag_max'] = max(self.stats['lag_max'], max(lags))
+
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{len(claimed)} pedido(s) expirado(s) cancelado(s). '
+                    f'Atraso médio {sum(lags) / len(lags) * 1000:.0f} ms, '
+                    f'máximo {max(lags) * 1000:.0f} ms'
+                )
+            )
+
+            if len(claimed) < self.batch_size:
+                break
+
+    def report(self):
+        cancelled = self.stats['cancelled']
+        lag_avg = self.stats['lag_total'] / cancelled if cancelled else 0.0
+        self.stdout.write(
+            f'📊 Cancelados: {cancelled} | '
+            f'atraso médio: {lag_avg * 1000:.0f} ms | '
+            f'atraso máximo: {self.stats["lag_max"] * 1000:.0f} ms | '
+            f'prazos na fila: {len(self.heap)}'
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:51
+
+import apps.orders.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='pickup_code',
+            field=models.CharField(blank=True, db_index=True, max_length=4, verbose_name='Código de Retirada'),
+        ),
+        migrations.CreateModel(
+            name='PickupCode',
+            fields=[
+                ('code', models.CharField(max_length=4, primary_key=True, serialize=False, verbose_name='Código de Retirada')),
+                ('sort_key', models.FloatField(default=apps.orders.models.random_sort_key, verbose_name='Ordem de Alocação')),
+                ('order', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pickup_code_slot', to='orders.order', verbose_name='Pedido')),
+            ],
+            options={
+                'verbose_name': 'Código de Retirada',
+                'verbose_name_plural': 'Códigos de Retirada',
+                'indexes': [models.Index(condition=models.Q(('order__isnull', True)), fields=['sort_key'], name='pickup_code_free_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+import random
+
+from django.db import migrations
+
+
+def populate_pickup_codes(apps, schema_editor):
+    """Cria os 10.000 códigos e vincula os que já pertencem a pedidos em andamento"""
+    Order = apps.get_model('orders', 'Order')
+    PickupCode = apps.get_model('orders', 'PickupCode')
+
+    active = dict(
+        Order.objects.exclude(status__in=['completed', 'cancelled'])
+        .order_by('created_at')
+        .values_list('pickup_code', 'id')
+    )
+    PickupCode.objects.bulk_create(
+        [
+            PickupCode(code=f'{n:04d}', order_id=active.get(f'{n:04d}'), sort_key=random.random())
+            for n in range(10000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_pickup_code_pool'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_pickup_codes, migrations.RunPython.noop),
+    ]
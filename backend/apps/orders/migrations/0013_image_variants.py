@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_archived_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='release_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,19 +1,148 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Prefetch, Sum
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
+from apps.coupons.models import Coupon
 from apps.products.models import Product
+from .notes import EXPIRED_NOTE, format_refund_note
+from .pickup import ready_orders
 import random
 import string
 
 User = get_user_model()
 
+# Prazo para pagar um pedido pendente antes de o estoque voltar
+RESERVATION_TIME = timedelta(minutes=10)
+
+# Status finais: o código de retirada volta para o pool
+FINISHED_STATUSES = ('completed', 'cancelled')
+
+# Cancelar a partir destes status gera reembolso
+REFUNDABLE_STATUSES = ('paid', 'processing', 'ready')
+
+
+def refund_note():
+    return format_refund_note(timezone.now())
+
 
 def generate_pickup_code():
-    """Gera código de retirada de 4 dígitos"""
+    """Gera código de retirada de 4 dígitos (mantido para migrations antigas)"""
     return ''.join(random.choices(string.digits, k=4))
 
 
+def random_sort_key():
+    """Posição aleatória de um código novo no pool"""
+    return random.random()
+
+
+class PickupCodeUnavailable(Exception):
+    """Todos os códigos de retirada estão vinculados a pedidos em andamento"""
+
+
+class OrderQuerySet(models.QuerySet):
+    
+    def with_details(self):
+        """
+        Carrega tudo que o OrderSerializer usa em número fixo de consultas:
+        usuários via JOIN, itens+produtos e só os 3 últimos históricos por pedido
+        """
+        return self.select_related('user', 'released_by').prefetch_related(
+            Prefetch(
+                'items',
+                queryset=OrderItem.objects.select_related('product').order_by('id')
+            ),
+            Prefetch(
+                'status_history',
+                queryset=OrderStatusHistory.objects.select_related('changed_by').order_by('-created_at')[:3],
+                to_attr='recent_status_history'
+            ),
+        )
+    
+    def release_reservations(self):
+        """
+        Devolve o que os pedidos cancelados seguravam: estoque (um UPDATE
+        agregado por produto) e usos de cupom (um por cupom)
+        Chame na transição para Cancelado, uma única vez por pedido
+        """
+        returned = (
+            OrderItem.objects.filter(order__in=self)
+            .values('product_id')
+            .annotate(total=Sum('quantity'))
+        )
+        Product.objects.adjust_stock({row['product_id']: row['total'] for row in returned})
+        
+        used = (
+            self.filter(coupon__isnull=False)
+            .values('coupon_id')
+            .annotate(total=Count('id'))
+        )
+        Coupon.objects.release({row['coupon_id']: row['total'] for row in used})
+
+
+    def bulk_transition(self, order_ids, new_status, changed_by=None):
+        """
+        Muda o status de vários pedidos de uma vez (fila do admin)
+        Um SELECT FOR UPDATE valida as transições, um UPDATE aplica e um
+        INSERT em lote grava o histórico. Cancelar devolve estoque e usos de
+        cupom de todo o lote como Order.cancel. Retorna {id: erro ou None}
+        """
+        status_names = dict(Order.STATUS_CHOICES)
+        results = {}
+        
+        with transaction.atomic():
+            rows = list(
+                self.select_for_update()
+                .filter(id__in=order_ids)
+                .order_by('id')
+                .values_list('id', 'status', 'pickup_code')
+            )
+            current = {order_id: status for order_id, status, _ in rows}
+            codes = {order_id: code for order_id, _, code in rows}
+            
+            eligible = []
+            for order_id in order_ids:
+                status = current.get(order_id)
+                if status is None:
+                    results[order_id] = 'Pedido não encontrado.'
+                elif status == new_status:
+                    results[order_id] = f'Pedido já está {status_names[status]}.'
+                elif not Order.is_valid_transition(status, new_status):
+                    results[order_id] = f'Não é possível mudar de {status_names[status]} para {status_names[new_status]}.'
+                else:
+                    results[order_id] = None
+                    eligible.append(order_id)
+            
+            if not eligible:
+                return results
+            
+            self.filter(id__in=eligible).update(status=new_status, updated_at=timezone.now())
+            
+            note = refund_note() if new_status == 'cancelled' else None
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(
+                    order_id=order_id,
+                    status=new_status,
+                    changed_by=changed_by,
+                    note=note if current[order_id] in REFUNDABLE_STATUSES else None
+                )
+                for order_id in eligible
+            ])
+            
+            if new_status in FINISHED_STATUSES:
+                PickupCode.objects.release([
+                    order_id for order_id in eligible
+                    if current[order_id] not in FINISHED_STATUSES
+                ])
+            if new_status == 'cancelled':
+                self.filter(id__in=eligible).release_reservations()
+            
+            ready_orders.track([(codes[order_id], order_id, new_status) for order_id in eligible])
+        
+        return results
+
+
 class Order(models.Model):
     """
     Pedidos realizados pelos clientes
@@ -28,6 +157,15 @@ class Order(models.Model):
         ('cancelled', 'Cancelado'),
     ]
     
+    # Transições proibidas: status atual -> status de destino
+    INVALID_TRANSITIONS = {
+        'paid': ['pending'],  # Não pode voltar para pendente após pago
+        'processing': ['pending', 'paid'],  # Não pode voltar
+        'ready': ['pending', 'paid', 'processing'],  # Não pode voltar
+        'completed': ['pending', 'paid', 'processing', 'ready'],  # Não pode voltar
+        'cancelled': ['pending', 'paid', 'processing', 'ready', 'completed'],  # Estoque e cupom já voltaram
+    }
+    
     PAYMENT_METHOD_CHOICES = [
         ('pix', 'PIX'),
         ('credit_card', 'Cartão de Crédito'),
@@ -76,10 +214,11 @@ class Order(models.Model):
         decimal_places=2,
         verbose_name='Valor Total'
     )
+    # Único apenas entre pedidos em andamento (garantido pelo pool PickupCode)
     pickup_code = models.CharField(
         max_length=4,
-        unique=True,
-        default=generate_pickup_code,
+        blank=True,
+        db_index=True,
         verbose_name='Código de Retirada'
     )
     notes = models.TextField(blank=True, null=True, verbose_name='Observações')
@@ -103,6 +242,8 @@ class Order(models.Model):
         null=True,
         verbose_name='Comprovante da Liberação'
     )
+    # Miniaturas do comprovante (ver mercadofree_backend.images)
+    release_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     released_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -117,40 +258,126 @@ class Order(models.Model):
         verbose_name='Liberado em'
     )
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='order_status_expires_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_cursor_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_cursor_idx'),
+        ]
     
     def __str__(self):
         return f"Pedido #{self.id} - {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda o status carregado para detectar mudanças sem nova consulta"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
         """
         Define data de expiração para pedidos pendentes (10 minutos)
         Cria histórico de status
+        Mudança de status (ex.: formulário do admin) recicla o código de
+        retirada como transition_to: finalizar devolve ao pool, reabrir pega outro
         """
-        is_new = not self.pk
-        old_status = None
-        
-        if not is_new:
-            try:
-                old_status = Order.objects.get(pk=self.pk).status
-            except Order.DoesNotExist:
-                pass
+        is_new = self._state.adding
+        old_status = getattr(self, '_loaded_status', None)
+        finishing = not is_new and old_status is not None and (
+            old_status not in FINISHED_STATUSES and self.status in FINISHED_STATUSES
+        )
+        reopening = not is_new and old_status in FINISHED_STATUSES and self.status not in FINISHED_STATUSES
         
         if is_new and self.status == 'pending':
-            self.expires_at = timezone.now() + timedelta(minutes=10)
+            self.expires_at = timezone.now() + RESERVATION_TIME
+        
+        with transaction.atomic():
+            claim_code = (is_new and not self.pickup_code and self.status not in FINISHED_STATUSES) or reopening
+            if claim_code:
+                # O código antigo pode ter sido reciclado: reabrir recebe um novo
+                self.pickup_code = PickupCode.objects.claim()[0]
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'pickup_code'}
+            
+            super().save(*args, **kwargs)
+            
+            if claim_code:
+                PickupCode.objects.bind([self])
+            elif finishing:
+                PickupCode.objects.release([self.pk])
+            
+            # Criar histórico de status
+            if is_new or (old_status and old_status != self.status):
+                OrderStatusHistory.objects.create(
+                    order=self,
+                    status=self.status,
+                    changed_by=None
+                )
+            # Qualquer edição invalida a resposta guardada pelo balcão
+            ready_orders.track([(self.pickup_code, self.pk, self.status)])
+        self._loaded_status = self.status
+    
+    @classmethod
+    def is_valid_transition(cls, current_status, new_status):
+        return new_status not in cls.INVALID_TRANSITIONS.get(current_status, [])
+    
+    def can_transition_to(self, new_status):
+        """Verifica se a transição a partir do status atual é permitida"""
+        return self.is_valid_transition(self.status, new_status)
+    
+    def transition_to(self, new_status, changed_by=None, note=None, **fields):
+        """
+        Muda o status com compare-and-set: UPDATE ... WHERE id=%s AND status=%s
+        Grava o histórico uma única vez, já com usuário e observação
+        Cancelar devolve o estoque e o uso do cupom (release_reservations)
+        Retorna False se outra requisição mudou o status antes (corrida perdida)
+        ou se a transição não é permitida
+        """
+        if not self.can_transition_to(new_status):
+            return False
         
-        super().save(*args, **kwargs)
+        now = timezone.now()
+        finishing = new_status in FINISHED_STATUSES and self.status not in FINISHED_STATUSES
+        cancelling = new_status == 'cancelled' and self.status != 'cancelled'
         
-        # Criar histórico de status
-        if is_new or (old_status and old_status != self.status):
+        with transaction.atomic():
+            updated = Order.objects.filter(pk=self.pk, status=self.status).update(
+                status=new_status,
+                updated_at=now,
+                **fields
+            )
+            if not updated:
+                return False
+            
             OrderStatusHistory.objects.create(
                 order=self,
-                status=self.status,
-                changed_by=None  # Será atualizado pela view quando necessário
+                status=new_status,
+                changed_by=changed_by,
+                note=note
             )
+            
+            if finishing:
+                PickupCode.objects.release([self.pk])
+            if cancelling:
+                Order.objects.filter(pk=self.pk).release_reservations()
+            
+            ready_orders.track([(self.pickup_code, self.pk, new_status)])
+        
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.status = self._loaded_status = new_status
+        self.updated_at = now
+        return True
+    
+    def cancel(self, changed_by=None, note=None):
+        """Cancela o pedido e devolve os produtos ao estoque e o uso do cupom"""
+        return self.transition_to('cancelled', changed_by=changed_by, note=note)
     
     def is_expired(self):
         """Verifica se o pedido pendente expirou"""
@@ -161,13 +388,7 @@ class Order(models.Model):
     def cancel_if_expired(self):
         """Cancela o pedido se estiver expirado e devolve estoque"""
         if self.is_expired():
-            self.status = 'cancelled'
-            self.save()
-            # Devolver produtos ao estoque
-            for item in self.items.all():
-                item.product.stock += item.quantity
-                item.product.save()
-            return True
+            return self.cancel(note=EXPIRED_NOTE)
         return False
     
     def get_installment_value(self):
@@ -258,3 +479,194 @@ class OrderStatusHistory(models.Model):
     
     def __str__(self):
         return f"Pedido #{self.order.id} - {self.get_status_display()} em {self.created_at}"
+
+
+class PickupCodeManager(models.Manager):
+    """
+    Pool de códigos de retirada: alocação e reciclagem sem laço de tentativas
+    """
+    
+    def claim(self, count=1, partial=False):
+        """
+        Reserva `count` códigos livres na transação atual
+        Busca pelo índice parcial de códigos livres: custo constante mesmo com o pool quase cheio
+        Com `partial`, devolve os que houver em vez de levantar PickupCodeUnavailable
+        Pool vazio (banco recém-criado, `flush`) é recriado na hora
+        """
+        free = (
+            self.select_for_update(skip_locked=True)
+            .filter(order__isnull=True)
+            .order_by('sort_key')
+            .values_list('code', flat=True)
+        )
+        codes = list(free[:count])
+        if len(codes) < count and not self.exists():
+            self.populate()
+            codes = list(free[:count])
+        if len(codes) < count and not partial:
+            raise PickupCodeUnavailable('Todos os códigos de retirada estão em uso.')
+        return codes
+    
+    def populate(self):
+        """Cria os códigos que faltarem no pool (0000-9999)"""
+        self.bulk_create(
+            [PickupCode(code=f'{n:04d}') for n in range(10000)],
+            batch_size=2000,
+            ignore_conflicts=True
+        )
+    
+    def bind(self, orders):
+        """Vincula os códigos reservados aos pedidos já gravados"""
+        self.bulk_update(
+            [PickupCode(code=order.pickup_code, order_id=order.pk) for order in orders],
+            ['order']
+        )
+    
+    def release(self, order_ids):
+        """
+        Devolve ao pool os códigos dos pedidos finalizados
+        Cada código vai para o fim da fila (próxima volta), mantendo a ordem aleatória
+        """
+        return self.filter(order_id__in=order_ids).update(
+            order=None,
+            sort_key=models.F('sort_key') + 1
+        )
+
+
+class PickupCode(models.Model):
+    """
+    Pool dos 10.000 códigos de retirada de 4 dígitos
+    Um código pertence a no máximo um pedido em andamento; é reciclado
+    quando o pedido é concluído ou cancelado
+    """
+    code = models.CharField(
+        max_length=4,
+        primary_key=True,
+        verbose_name='Código de Retirada'
+    )
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pickup_code_slot',
+        verbose_name='Pedido'
+    )
+    # Parte inteira: quantas vezes o código já foi reciclado; fração: ordem aleatória
+    sort_key = models.FloatField(default=random_sort_key, verbose_name='Ordem de Alocação')
+    
+    objects = PickupCodeManager()
+    
+    class Meta:
+        verbose_name = 'Código de Retirada'
+        verbose_name_plural = 'Códigos de Retirada'
+        indexes = [
+            models.Index(
+                fields=['sort_key'],
+                condition=models.Q(order__isnull=True),
+                name='pickup_code_free_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return self.code
+
+
+class IdempotencyKeyManager(models.Manager):
+    
+    def claim(self, key_hash, fingerprint, ttl):
+        """
+        Reivindica a chave para a requisição atual
+        Retorna None se esta requisição deve executar, ou o registro já gravado
+        Uma duplicata concorrente fica bloqueada no índice único até a
+        transação da original terminar, e então lê a resposta gravada
+        """
+        now = timezone.now()
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    self.create(key_hash=key_hash, fingerprint=fingerprint, expires_at=now + ttl)
+                return None
+            except IntegrityError:
+                record = self.filter(key_hash=key_hash).first()
+                if record is None:
+                    continue
+                if record.expires_at > now:
+                    return record
+                record.delete()
+        return None
+    
+    def evict_expired(self):
+        """Remove chaves vencidas (TTL)"""
+        return self.filter(expires_at__lt=timezone.now()).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respostas de POSTs com cabeçalho Idempotency-Key
+    Retentativas com a mesma chave recebem a resposta original em vez de
+    criar outro pedido/pagamento. Guarda só hashes e o corpo da resposta
+    """
+    key_hash = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name='Hash da Chave'
+    )
+    fingerprint = models.CharField(max_length=64, verbose_name='Hash da Requisição')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Status HTTP')
+    response_body = models.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Resposta'
+    )
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Expira em')
+    
+    objects = IdempotencyKeyManager()
+    
+    class Meta:
+        verbose_name = 'Chave de Idempotência'
+        verbose_name_plural = 'Chaves de Idempotência'
+    
+    def __str__(self):
+        return self.key_hash
+
+
+class ArchivedOrder(models.Model):
+    """
+    Pedidos concluídos/cancelados antigos, movidos para fora das tabelas quentes
+    `data` guarda a saída do OrderSerializer no momento do arquivamento, com
+    histórico completo e pagamento, e é devolvida como está pela API
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID do Pedido')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_orders',
+        verbose_name='Cliente'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        verbose_name='Status'
+    )
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Valor Total'
+    )
+    created_at = models.DateTimeField(verbose_name='Criado em')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')
+    data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Pedido Serializado')
+    
+    class Meta:
+        verbose_name = 'Pedido Arquivado'
+        verbose_name_plural = 'Pedidos Arquivados'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archived_created_cursor_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_user_cursor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Pedido arquivado #{self.id}"
@@ -0,0 +1,13 @@
+"""
+Observações automáticas do histórico de pedidos
+
+Sem Django: usadas também pela geração de pedidos sintéticos
+(apps.products.loadgen), que roda fora dele
+"""
+
+EXPIRED_NOTE = 'Cancelado automaticamente: reserva expirada sem pagamento'
+
+
+def format_refund_note(moment):
+    """Observação do cancelamento com reembolso emitido em `moment`"""
+    return f'Pedido cancelado. Reembolso emitido em {moment.strftime("%d/%m/%Y às %H:%M:%S")}'
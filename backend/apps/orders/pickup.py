@@ -0,0 +1,78 @@
+"""
+Índice em memória dos pedidos prontos para retirada (código -> pedido)
+
+O balcão consulta o código sem ir ao banco: cada entrada guarda o id do
+pedido e, depois da primeira consulta, a resposta já serializada. Cada
+processo mantém o seu índice, atualizado pelas transições e saves feitos
+nele mesmo; mudanças feitas em outros processos aparecem quando a resposta
+guardada vence (ENTRY_TTL) ou na confirmação da retirada, que sempre confere
+o pedido no banco antes do compare-and-set. Código fora do índice cai na
+busca indexada por pickup_code.
+"""
+import threading
+import time
+from django.db import transaction
+
+# Por quanto tempo a resposta guardada de um pedido é servida sem reler o banco (s)
+ENTRY_TTL = 30
+
+
+class ReadyOrderIndex:
+    """código -> [id do pedido, resposta serializada ou None, vence em]"""
+
+    def __init__(self, ttl=ENTRY_TTL):
+        self.ttl = ttl
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    def get(self, code):
+        """id do pedido com o código ou None"""
+        entry = self.orders.get(code)
+        return entry[0] if entry is not None else None
+
+    def response(self, code):
+        """Resposta guardada do pedido com o código, se ainda válida"""
+        entry = self.orders.get(code)
+        if entry is not None and entry[1] is not None and entry[2] > time.monotonic():
+            return entry[1]
+        return None
+
+    def remember(self, code, order_id, data):
+        """Guarda a resposta serializada de um pedido pronto"""
+        with self.lock:
+            self.orders[code] = [order_id, data, time.monotonic() + self.ttl]
+
+    def add(self, code, order_id):
+        with self.lock:
+            self.orders[code] = [order_id, None, 0]
+
+    def discard(self, code, order_id=None):
+        """Remove o código (se `order_id` for dado, só se ainda apontar para esse pedido)"""
+        with self.lock:
+            entry = self.orders.get(code)
+            if entry is not None and (order_id is None or entry[0] == order_id):
+                del self.orders[code]
+
+    def track(self, changes):
+        """
+        Aplica [(código, id, status), ...] quando a transação confirmar
+        Pedido pronto entra (ou tem a resposta guardada descartada); os demais saem
+        Transação desfeita não deixa rastro no índice
+        """
+        def apply():
+            for code, order_id, status in changes:
+                if not code:
+                    continue
+                if status == 'ready':
+                    self.add(code, order_id)
+                else:
+                    self.discard(code, order_id)
+
+        transaction.on_commit(apply)
+
+    def clear(self):
+        with self.lock:
+            self.orders = {}
+
+
+ready_orders = ReadyOrderIndex()
@@ -1,16 +1,30 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusHistory
 from apps.products.serializers import ProductListSerializer
+from mercadofree_backend.fastlist import Computed, Later, RowShape, grouped
+from mercadofree_backend.images import ImageSrcsetField
+
+
+def time_remaining(status, expires_at):
+    """Tempo restante da reserva em segundos (apenas para pedidos pendentes)"""
+    if status == 'pending' and expires_at:
+        remaining = (expires_at - timezone.now()).total_seconds()
+        return max(0, int(remaining))
+    return None
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_image = serializers.ImageField(source='product.image', read_only=True)
+    product_image_srcset = ImageSrcsetField('image', source='product')
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'product_name', 'product_image', 'quantity', 'price', 'subtotal']
+        fields = ['id', 'product', 'product_name', 'product_image', 'product_image_srcset', 'quantity', 'price', 'subtotal']
         read_only_fields = ['id', 'price', 'subtotal']
 
 
@@ -25,18 +39,19 @@ class OrderSerializer(serializers.ModelSerializer):
     installment_display = serializers.CharField(source='get_installment_display', read_only=True)
     released_by_name = serializers.CharField(source='released_by.username', read_only=True)
     status_history = serializers.SerializerMethodField()
+    release_image_srcset = ImageSrcsetField('release_image')
     
     class Meta:
         model = Order
         fields = [
             'id', 'user', 'user_name', 'status', 'status_display', 'payment_method', 
             'payment_method_display', 'installments', 'installment_value', 'installment_display',
-            'total_amount', 'pickup_code', 'notes', 'items', 
+            'coupon', 'discount_amount', 'total_amount', 'pickup_code', 'notes', 'items', 
             'created_at', 'updated_at', 'expires_at', 'is_expired', 'time_remaining',
-            'manual_release', 'release_reason', 'release_image', 'released_by', 
+            'manual_release', 'release_reason', 'release_image', 'release_image_srcset', 'released_by', 
             'released_by_name', 'released_at', 'status_history'
         ]
-        read_only_fields = ['id', 'user', 'pickup_code', 'created_at', 'updated_at', 
+        read_only_fields = ['id', 'user', 'coupon', 'discount_amount', 'pickup_code', 'created_at', 'updated_at', 
                             'expires_at', 'released_by', 'released_at']
     
     def get_is_expired(self, obj):
@@ -45,11 +60,7 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def get_time_remaining(self, obj):
         """Retorna tempo restante em segundos (apenas para pedidos pendentes)"""
-        if obj.status == 'pending' and obj.expires_at:
-            from django.utils import timezone
-            remaining = (obj.expires_at - timezone.now()).total_seconds()
-            return max(0, int(remaining))
-        return None
+        return time_remaining(obj.status, obj.expires_at)
     
     def get_installment_value(self, obj):
         """Retorna o valor de cada parcela"""
@@ -57,7 +68,9 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def get_status_history(self, obj):
         """Retorna apenas os últimos 3 registros do histórico"""
-        history = obj.status_history.all()[:3]
+        history = getattr(obj, 'recent_status_history', None)
+        if history is None:
+            history = obj.status_history.select_related('changed_by')[:3]
         return OrderStatusHistorySerializer(history, many=True).data
 
 
@@ -76,6 +89,7 @@ class CreateOrderSerializer(serializers.Serializer):
         default='pix'
     )
     installments = serializers.IntegerField(default=1, min_value=1, max_value=12)
+    coupon_code = serializers.CharField(required=False, allow_blank=True, max_length=50)
     
     def validate_items(self, value):
         if not value:
@@ -92,6 +106,22 @@ class CreateOrderSerializer(serializers.Serializer):
         return value
 
 
+class BulkUpdateStatusSerializer(serializers.Serializer):
+    """
+    Serializer para atualização de status em lote
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=1000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    
+    def validate_ids(self, value):
+        # Remove repetidos mantendo a ordem
+        return list(dict.fromkeys(value))
+
+
 class OrderStatusHistorySerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     changed_by_name = serializers.CharField(source='changed_by.username', read_only=True)
@@ -100,3 +130,71 @@ class OrderStatusHistorySerializer(serializers.ModelSerializer):
         model = OrderStatusHistory
         fields = ['id', 'status', 'status_display', 'changed_by', 'changed_by_name', 'note', 'created_at']
         read_only_fields = ['id', 'created_at']
+
+
+# Listagem rápida (FAST_LIST_RENDERER): mesma saída do OrderSerializer.
+# As regras abaixo repetem Order.is_expired/get_installment_value/get_installment_display
+# sobre as colunas, sem instanciar o modelo
+
+def is_expired(status, expires_at):
+    return status == 'pending' and expires_at is not None and timezone.now() > expires_at
+
+
+def installment_value(total_amount, installments):
+    return total_amount / installments if installments > 1 else total_amount
+
+
+def installment_display(total_amount, installments):
+    if installments == 1:
+        return f"À vista: R$ {total_amount:.2f}"
+    return f"{installments}x de R$ {installment_value(total_amount, installments):.2f}"
+
+
+order_item_rows = RowShape(
+    OrderItemSerializer,
+    subtotal=Computed(lambda quantity, price: quantity * price, 'quantity', 'price'),
+)
+
+status_history_rows = RowShape(OrderStatusHistorySerializer)
+
+order_list_rows = RowShape(
+    OrderSerializer,
+    items=Later(),
+    status_history=Later(),
+    installment_value=Computed(
+        lambda total_amount, installments: float(installment_value(total_amount, installments)),
+        'total_amount', 'installments'
+    ),
+    installment_display=Computed(installment_display, 'total_amount', 'installments'),
+    is_expired=Computed(is_expired, 'status', 'expires_at'),
+    time_remaining=Computed(time_remaining, 'status', 'expires_at'),
+)
+
+
+def attach_order_details(data, request=None):
+    """
+    Preenche items e status_history (3 últimos) das linhas de order_list_rows
+    Duas consultas para a página inteira, como o with_details
+    """
+    ids = [row['id'] for row in data]
+    if not ids:
+        return
+    
+    items = grouped(
+        order_item_rows,
+        OrderItem.objects.filter(order_id__in=ids).order_by('id').values('order_id', *order_item_rows.lookups),
+        'order_id',
+        request
+    )
+    history = grouped(
+        status_history_rows,
+        OrderStatusHistory.objects.filter(order_id__in=ids)
+        .annotate(position=Window(RowNumber(), partition_by=F('order_id'), order_by=F('created_at').desc()))
+        .filter(position__lte=3)
+        .order_by('order_id', 'position')
+        .values('order_id', *status_history_rows.lookups),
+        'order_id'
+    )
+    for row in data:
+        row['items'] = items.get(row['id'], [])
+        row['status_history'] = history.get(row['id'], [])
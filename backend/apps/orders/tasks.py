@@ -1,25 +1,209 @@
 """
-Tasks para execução automática periódica
-Execute este comando a cada 1-5 minutos via cron ou scheduler:
+Tasks para expiração de pedidos pendentes
+Execute o worker residente, que cancela cada pedido no momento exato da expiração:
+  python manage.py run_expiry_worker
+Ou, alternativamente, este comando a cada 1-5 minutos via cron ou scheduler:
   python manage.py cancel_expired_orders
+
+Também concentra a limpeza em massa de pedidos (reset_orders e ações do admin)
+e o arquivamento de pedidos finalizados antigos (archive_orders)
 """
+from django.db import connection, transaction
+from django.db.models import Prefetch, Sum
 from django.utils import timezone
-from .models import Order
+from apps.products.models import Product
+from .models import (
+    EXPIRED_NOTE, FINISHED_STATUSES, ArchivedOrder, Order, OrderItem, OrderStatusHistory, PickupCode
+)
 
 
-def cancel_expired_orders():
+def cancel_orders(order_ids, note=None, now=None):
     """
-    Cancela pedidos pendentes que expiraram (>10 minutos)
-    Retorna quantidade de pedidos cancelados
+    Cancela em lote pedidos pendentes já bloqueados pela transação atual
+    Um UPDATE para os pedidos, um INSERT para o histórico, um UPDATE para
+    liberar os códigos de retirada, um UPDATE agregado por produto para
+    devolver o estoque e um por cupom para devolver os usos
     """
-    expired_orders = Order.objects.filter(
-        status='pending',
-        expires_at__lt=timezone.now()
+    if not order_ids:
+        return 0
+    
+    now = now or timezone.now()
+    
+    count = Order.objects.filter(id__in=order_ids, status='pending').update(
+        status='cancelled',
+        updated_at=now
     )
     
-    count = 0
-    for order in expired_orders:
-        if order.cancel_if_expired():
-            count += 1
+    OrderStatusHistory.objects.bulk_create([
+        OrderStatusHistory(order_id=order_id, status='cancelled', note=note)
+        for order_id in order_ids
+    ])
+    PickupCode.objects.release(order_ids)
+    Order.objects.filter(id__in=order_ids).release_reservations()
     
     return count
+
+
+def claim_expired_orders(limit=None, now=None):
+    """
+    Reivindica e cancela um lote de pedidos expirados
+    FOR UPDATE SKIP LOCKED permite vários workers em paralelo sem disputa
+    Retorna lista de (id, expires_at) dos pedidos cancelados
+    """
+    now = now or timezone.now()
+    
+    with transaction.atomic():
+        # SKIP LOCKED: pedidos sendo pagos/cancelados agora ficam para a próxima rodada
+        queryset = (
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', expires_at__lt=now)
+            .order_by('expires_at')
+            .values_list('id', 'expires_at')
+        )
+        if limit:
+            queryset = queryset[:limit]
+        
+        claimed = list(queryset)
+        cancel_orders([order_id for order_id, _ in claimed], note=EXPIRED_NOTE, now=now)
+    
+    return claimed
+
+
+def cancel_expired_orders(now=None):
+    """
+    Cancela pedidos pendentes que expiraram (>10 minutos)
+    Operação em conjunto: não carrega os pedidos nem seus itens em memória
+    Retorna quantidade de pedidos cancelados
+    """
+    return len(claim_expired_orders(now=now))
+
+
+def restore_stock(order_ids=None):
+    """
+    Devolve ao estoque os itens dos pedidos que ainda seguram estoque
+    (cancelados já devolveram). Um GROUP BY por produto e um UPDATE
+    `order_ids=None` considera todos os pedidos
+    """
+    items = OrderItem.objects.exclude(order__status='cancelled')
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    
+    returned = {
+        row['product_id']: row['total']
+        for row in items.values('product_id').annotate(total=Sum('quantity'))
+    }
+    Product.objects.adjust_stock(returned)
+    return returned
+
+
+def purge_orders(queryset=None, chunk_size=5000, truncate=False, progress=None):
+    """
+    Deleta pedidos devolvendo o estoque
+    Em lotes de `chunk_size`: cada lote devolve seu estoque e é deletado na
+    mesma transação, então uma interrupção pode ser retomada sem devolver
+    estoque em dobro. `truncate` (só PostgreSQL, sem queryset) limpa tudo com
+    TRUNCATE. `progress(deleted, total)` é chamado após cada lote.
+    Retorna (pedidos deletados, produtos atualizados)
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+        if truncate and connection.vendor == 'postgresql':
+            return _truncate_orders()
+        ArchivedOrder.objects.all().delete()
+    
+    total = queryset.count()
+    deleted = 0
+    products_updated = set()
+    
+    while True:
+        with transaction.atomic():
+            order_ids = list(queryset.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not order_ids:
+                break
+            
+            products_updated.update(restore_stock(order_ids))
+            
+            PickupCode.objects.release(order_ids)
+            Order.objects.filter(id__in=order_ids).delete()
+        
+        deleted += len(order_ids)
+        if progress:
+            progress(deleted, total)
+    
+    return deleted, len(products_updated)
+
+
+def _truncate_orders():
+    """
+    Caminho rápido para zerar tudo no PostgreSQL
+    TRUNCATE ... CASCADE também esvazia o pool de códigos, recriado em seguida
+    """
+    with transaction.atomic():
+        total = Order.objects.count()
+        products_updated = len(restore_stock())
+        
+        tables = ', '.join(
+            connection.ops.quote_name(model._meta.db_table)
+            for model in (Order, OrderItem, OrderStatusHistory, PickupCode, ArchivedOrder)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+        
+        PickupCode.objects.populate()
+    
+    return total, products_updated
+
+
+def archive_orders(older_than, batch_size=1000, progress=None):
+    """
+    Move pedidos concluídos/cancelados criados antes de `older_than` para
+    ArchivedOrder, em lotes: cada lote é serializado com número fixo de
+    consultas, gravado no arquivo e removido das tabelas quentes na mesma transação
+    Retorna a quantidade de pedidos arquivados
+    """
+    from apps.payments.serializers import PaymentSerializer
+    from .serializers import OrderSerializer, OrderStatusHistorySerializer
+    
+    candidates = Order.objects.filter(status__in=FINISHED_STATUSES, created_at__lt=older_than)
+    total = candidates.count()
+    archived = 0
+    
+    while True:
+        with transaction.atomic():
+            orders = list(
+                candidates.select_for_update(skip_locked=True, of=('self',))
+                .order_by('id')
+                .with_details()
+                .select_related('payment')
+                .prefetch_related(Prefetch(
+                    'status_history',
+                    queryset=OrderStatusHistory.objects.select_related('changed_by'),
+                    to_attr='full_status_history'
+                ))[:batch_size]
+            )
+            if not orders:
+                break
+            
+            snapshots = []
+            for order in orders:
+                data = OrderSerializer(order).data
+                data['status_history'] = OrderStatusHistorySerializer(order.full_status_history, many=True).data
+                payment = getattr(order, 'payment', None)
+                data['payment'] = PaymentSerializer(payment).data if payment else None
+                snapshots.append(ArchivedOrder(
+                    id=order.id,
+                    user_id=order.user_id,
+                    status=order.status,
+                    total_amount=order.total_amount,
+                    created_at=order.created_at,
+                    data=data
+                ))
+            
+            ArchivedOrder.objects.bulk_create(snapshots)
+            Order.objects.filter(id__in=[order.id for order in orders]).delete()
+        
+        archived += len(orders)
+        if progress:
+            progress(archived, total)
+    
+    return archived
@@ -0,0 +1,185 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.coupons.models import Coupon
+from apps.products.models import Category, Product
+from .models import Order, PickupCode
+
+
+class OrderQueryCountTests(TestCase):
+    """
+    Listagem e detalhe de pedidos em número fixo de consultas (with_details),
+    qualquer que seja a quantidade de pedidos, itens e históricos
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        cls.customer = User.objects.create_user('cliente', 'cliente@example.com', 'cliente123')
+        category = Category.objects.create(name='Eletrônicos')
+        cls.products = [
+            Product.objects.create(
+                name=f'Produto {index}',
+                description='Descrição',
+                price=10 + index,
+                stock=1000,
+                category=category
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def create_orders(self, count):
+        """Pedidos com 1 a 3 itens; metade avança para Pago (mais histórico)"""
+        for index in range(count):
+            items = [
+                {'product_id': product.id, 'quantity': 1}
+                for product in self.products[:index % 3 + 1]
+            ]
+            response = self.client.post('/api/orders/', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 201)
+            if index % 2:
+                order = Order.objects.get(pk=response.data['id'])
+                self.assertTrue(order.transition_to('paid', changed_by=self.admin))
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def assert_constant_list_queries(self, client, url):
+        self.create_orders(5)
+        few, response = self.count_queries(client, url)
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.create_orders(5)
+        many, response = self.count_queries(client, url)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(few, many)
+
+    def test_list_queries_do_not_grow_with_orders(self):
+        self.assert_constant_list_queries(self.admin_client, '/api/orders/')
+
+    def test_customer_list_queries_do_not_grow_with_orders(self):
+        self.assert_constant_list_queries(self.client, '/api/orders/')
+
+    def test_my_orders_queries_do_not_grow_with_orders(self):
+        self.assert_constant_list_queries(self.client, '/api/orders/my_orders/')
+
+    @override_settings(FAST_LIST_RENDERER=True)
+    def test_fast_list_queries_do_not_grow_with_orders(self):
+        self.assert_constant_list_queries(self.admin_client, '/api/orders/')
+
+    def test_detail_queries_do_not_grow_with_items_or_history(self):
+        self.create_orders(6)
+        orders = Order.objects.order_by('id')
+        small = orders.first()  # 1 item, só o histórico inicial
+        large = orders.last()  # 3 itens, histórico até Pago
+        self.assertLess(small.items.count(), large.items.count())
+        self.assertLess(small.status_history.count(), large.status_history.count())
+
+        few, _ = self.count_queries(self.admin_client, f'/api/orders/{small.pk}/')
+        many, _ = self.count_queries(self.admin_client, f'/api/orders/{large.pk}/')
+        self.assertEqual(few, many)
+
+
+class AdminCancelTests(TestCase):
+    """Cancelar pelo admin devolve o estoque e o uso do cupom, como Order.cancel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        cls.customer = User.objects.create_user('cliente', 'cliente@example.com', 'cliente123')
+        cls.product = Product.objects.create(name='Produto', description='Descrição', price=100, stock=10)
+        now = timezone.now()
+        cls.coupon = Coupon.objects.create(
+            code='DEZ',
+            discount_value=10,
+            max_uses=5,
+            valid_from=now - timedelta(days=1),
+            valid_until=now + timedelta(days=1)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def place_paid_order(self, quantity=2):
+        response = self.client.post('/api/orders/', {
+            'items': [{'product_id': self.product.id, 'quantity': quantity}],
+            'coupon_code': 'dez',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertTrue(order.transition_to('paid', changed_by=self.admin))
+        return order
+
+    def assert_usage(self, used_count, stock):
+        self.coupon.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, used_count)
+        self.assertEqual(self.product.stock, stock)
+
+    def test_update_status_cancel_releases_coupon_and_stock(self):
+        order = self.place_paid_order()
+        self.assert_usage(used_count=1, stock=8)
+
+        response = self.admin_client.post(f'/api/orders/{order.pk}/update_status/', {'status': 'cancelled'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assert_usage(used_count=0, stock=10)
+
+    def test_cancelled_order_cannot_be_reopened(self):
+        order = self.place_paid_order()
+        self.assertTrue(order.cancel(changed_by=self.admin))
+
+        response = self.admin_client.post(f'/api/orders/{order.pk}/update_status/', {'status': 'paid'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(order.transition_to('paid'))
+        order.cancel()  # cancelar de novo não devolve outra vez
+        self.assert_usage(used_count=0, stock=10)
+
+
+    def test_bulk_cancel_releases_coupon_and_stock(self):
+        orders = [self.place_paid_order(quantity=3), self.place_paid_order(quantity=1)]
+        self.assert_usage(used_count=2, stock=6)
+
+        response = self.admin_client.post('/api/orders/bulk_update_status/', {
+            'ids': [order.pk for order in orders],
+            'status': 'cancelled',
+        }, format='json')
+
+        self.assertEqual(response.data['updated'], 2)
+        self.assert_usage(used_count=0, stock=10)
+
+class PickupCodePoolTests(TransactionTestCase):
+    """O pool de códigos de retirada se recria quando a tabela está vazia (flush)"""
+
+    def test_checkout_repopulates_empty_pool(self):
+        PickupCode.objects.all().delete()
+        customer = get_user_model().objects.create_user('cliente', 'cliente@example.com', 'cliente123')
+        product = Product.objects.create(name='Produto', description='Descrição', price=10, stock=5)
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        response = client.post('/api/orders/', {'items': [{'product_id': product.id, 'quantity': 1}]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(PickupCode.objects.get(order=order).code, order.pickup_code)
+        self.assertEqual(PickupCode.objects.count(), 10000)
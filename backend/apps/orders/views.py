@@ -2,124 +2,87 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db import transaction
-from django.db.models import F
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.utils import timezone
-from .models import Order, OrderItem
-from apps.products.models import Product
-from .serializers import OrderSerializer, CreateOrderSerializer
+from mercadofree_backend.images import schedule_derivatives
+from .models import REFUNDABLE_STATUSES, ArchivedOrder, Order, refund_note
+from .checkout import CheckoutError, intake, place_order
+from .idempotency import idempotent
+from .pickup import ready_orders
+from .serializers import (
+    BulkUpdateStatusSerializer, CreateOrderSerializer, OrderSerializer, attach_order_details, order_list_rows
+)
+from mercadofree_backend.fastlist import FastListMixin
+from mercadofree_backend.pagination import CreatedAtCursorPagination
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar pedidos com controle de concorrência e expiração
+    Listagem pelo caminho rápido com FAST_LIST_RENDERER (mercadofree_backend.fastlist)
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    fast_list_rows = order_list_rows
     
     def get_queryset(self):
-        """Retorna pedidos e cancela automaticamente os expirados"""
+        """
+        Retorna pedidos do usuário (ou todos, para admin)
+        Somente leitura: a expiração é feita por apps.orders.tasks
+        """
         user = self.request.user
         
-        # Cancelar pedidos pendentes expirados
-        expired_orders = Order.objects.filter(
-            status='pending',
-            expires_at__lt=timezone.now()
-        )
-        for order in expired_orders:
-            order.cancel_if_expired()
+        queryset = Order.objects.all()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.with_details()
         
         if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
+    
+    def finish_fast_list(self, data):
+        attach_order_details(data, self.request)
+    
+    def get_archived_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return ArchivedOrder.objects.all()
+        return ArchivedOrder.objects.filter(user=user)
     
-    @transaction.atomic
+    def retrieve(self, request, *args, **kwargs):
+        """Detalhe do pedido; pedidos arquivados continuam acessíveis pelo mesmo id"""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            try:
+                archived = self.get_archived_queryset().filter(pk=kwargs['pk']).first()
+            except (TypeError, ValueError, ValidationError):
+                archived = None  # id inválido (ex.: /api/orders/abc/)
+            if archived is None:
+                raise
+            return Response({**archived.data, 'archived': True})
+    
+    @idempotent('orders.create')
     def create(self, request, *args, **kwargs):
         """
         Cria um novo pedido com controle de concorrência
         Sistema: Quem compra primeiro leva o produto
+        Com ORDER_INTAKE['BATCHING'], checkouts simultâneos são gravados em lote
+        Aceita cabeçalho Idempotency-Key (retentativas não duplicam o pedido)
         """
         serializer = CreateOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        items_data = serializer.validated_data['items']
-        notes = serializer.validated_data.get('notes', '')
-        payment_method = serializer.validated_data.get('payment_method', 'pix')
-        installments = serializer.validated_data.get('installments', 1)
-        
-        # Calcular total e validar estoque COM LOCK (evita race condition)
-        total_amount = 0
-        order_items = []
-        unavailable_products = []
-        
-        for item_data in items_data:
-            try:
-                # SELECT FOR UPDATE: bloqueia o produto durante a transação
-                product = Product.objects.select_for_update().get(
-                    id=item_data['product_id'],
-                    is_active=True
-                )
-            except Product.DoesNotExist:
-                return Response(
-                    {'error': f"Produto {item_data['product_id']} não encontrado ou inativo."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            quantity = item_data['quantity']
-            
-            # Verificação atômica de estoque
-            if product.stock < quantity:
-                unavailable_products.append({
-                    'name': product.name,
-                    'requested': quantity,
-                    'available': product.stock
-                })
-                continue
-            
-            subtotal = product.price * quantity
-            total_amount += subtotal
-            order_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': product.price
-            })
-        
-        # Se algum produto não está disponível, retorna erro detalhado
-        if unavailable_products:
-            error_msg = "Produtos indisponíveis:\n"
-            for item in unavailable_products:
-                if item['available'] == 0:
-                    error_msg += f"• {item['name']}: ESGOTADO (outra pessoa comprou antes)\n"
-                else:
-                    error_msg += f"• {item['name']}: Solicitado {item['requested']}, disponível {item['available']}\n"
-            
-            return Response(
-                {'error': error_msg.strip()},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Criar pedido
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=total_amount,
-            notes=notes,
-            payment_method=payment_method,
-            installments=installments,
-            status='pending'  # Inicia como pendente
-        )
-        
-        # Criar items e RESERVAR estoque (diminuir)
-        for item_data in order_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                quantity=item_data['quantity'],
-                price=item_data['price']
-            )
-            # Atualizar estoque atomicamente
-            Product.objects.filter(id=item_data['product'].id).update(
-                stock=F('stock') - item_data['quantity']
-            )
+        try:
+            if settings.ORDER_INTAKE['BATCHING']:
+                order = intake.submit(request.user, serializer.validated_data)
+            else:
+                order = place_order(request.user, serializer.validated_data)
+        except CheckoutError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
         return Response(
             OrderSerializer(order).data,
@@ -144,52 +107,133 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
         
         # Validações de transição de status
-        invalid_transitions = {
-            'paid': ['pending'],  # Não pode voltar para pendente após pago
-            'processing': ['pending', 'paid'],  # Não pode voltar
-            'ready': ['pending', 'paid', 'processing'],  # Não pode voltar
-            'completed': ['pending', 'paid', 'processing', 'ready'],  # Não pode voltar
-        }
-        
-        if current_status in invalid_transitions:
-            if new_status in invalid_transitions[current_status]:
-                return Response(
-                    {'error': f'Não é possível mudar de {order.get_status_display()} para {dict(Order.STATUS_CHOICES)[new_status]}.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if not order.can_transition_to(new_status):
+            return Response(
+                {'error': f'Não é possível mudar de {order.get_status_display()} para {dict(Order.STATUS_CHOICES)[new_status]}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Verificar se é liberação manual
         release_reason = request.data.get('release_reason')
         release_image = request.FILES.get('release_image')
         
+        if new_status == current_status and not release_reason:
+            return Response(OrderSerializer(order).data)
+        
+        fields = {}
         if release_reason:
             # Liberação manual
-            order.manual_release = True
-            order.release_reason = release_reason
-            order.released_by = request.user
-            order.released_at = timezone.now()
+            fields.update(
+                manual_release=True,
+                release_reason=release_reason,
+                released_by=request.user,
+                released_at=timezone.now()
+            )
             
             if release_image:
-                order.release_image = release_image
+                order.release_image.save(release_image.name, release_image, save=False)
+                fields['release_image'] = order.release_image.name
         
         # Se cancelar após pagamento, adicionar nota de reembolso
         note = None
-        if new_status == 'cancelled' and current_status in ['paid', 'processing', 'ready']:
-            note = f'Pedido cancelado. Reembolso emitido em {timezone.now().strftime("%d/%m/%Y às %H:%M:%S")}'
+        if new_status == 'cancelled' and current_status in REFUNDABLE_STATUSES:
+            note = refund_note()
         
-        order.status = new_status
-        order.save()
+        if not order.transition_to(new_status, changed_by=request.user, note=note, **fields):
+            if release_image:
+                # A imagem já foi gravada, mas o pedido não a referencia
+                order.release_image.delete(save=False)
+            return Response(
+                {'error': 'O status do pedido foi alterado por outra pessoa. Recarregue e tente novamente.'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        # Atualizar histórico com usuário e nota
-        latest_history = order.status_history.first()
-        if latest_history:
-            latest_history.changed_by = request.user
-            if note:
-                latest_history.note = note
-            latest_history.save()
+        if release_image:
+            schedule_derivatives(order, 'release_image')
         
         return Response(OrderSerializer(order).data)
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_update_status(self, request):
+        """
+        Atualiza o status de vários pedidos em uma requisição (apenas admin)
+        Body: { "ids": [1, 2, 3], "status": "completed" }
+        Retorna sucesso/erro por pedido
+        """
+        serializer = BulkUpdateStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = Order.objects.bulk_transition(
+            serializer.validated_data['ids'],
+            serializer.validated_data['status'],
+            changed_by=request.user
+        )
+        
+        return Response({
+            'updated': sum(1 for error in results.values() if error is None),
+            'results': [
+                {'id': order_id, 'success': error is None, 'error': error}
+                for order_id, error in results.items()
+            ]
+        })
+    
+    def find_ready_order(self, code):
+        """
+        Pedido pronto com o código de retirada, conferido no banco
+        Usa o id do índice em memória; se faltar ou estiver velho, a busca
+        indexada por pickup_code
+        """
+        queryset = Order.objects.with_details()
+        order_id = ready_orders.get(code)
+        if order_id is not None:
+            order = queryset.filter(pk=order_id, pickup_code=code, status='ready').first()
+            if order is not None:
+                return order
+            ready_orders.discard(code, order_id)
+        
+        order = queryset.filter(pickup_code=code, status='ready').first()
+        if order is not None:
+            ready_orders.add(code, order.pk)
+        return order
+    
+    @action(
+        detail=False,
+        methods=['get', 'post'],
+        url_path=r'pickup/(?P<code>\d{4})',
+        permission_classes=[IsAdminUser]
+    )
+    def pickup(self, request, code=None):
+        """
+        Balcão de retirada (apenas admin)
+        GET: pedido pronto com o código, servido do índice em memória sem
+        consultar o banco (apps.orders.pickup)
+        POST: confere o pedido no banco e confirma a retirada (Pronto → Concluído)
+        """
+        if request.method == 'GET':
+            data = ready_orders.response(code)
+            if data is not None:
+                return Response(data)
+        
+        order = self.find_ready_order(code)
+        if order is None:
+            return Response(
+                {'error': f'Nenhum pedido pronto para retirada com o código {code}.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if request.method == 'POST':
+            if not order.transition_to('completed', changed_by=request.user, note='Retirado no balcão'):
+                return Response(
+                    {'error': 'O status do pedido foi alterado por outra pessoa. Recarregue e tente novamente.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            del order.recent_status_history  # histórico mudou: o serializer recarrega
+            return Response(OrderSerializer(order).data)
+        
+        data = OrderSerializer(order).data
+        ready_orders.remember(code, order.pk, data)
+        return Response(data)
+    
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """
@@ -212,15 +256,12 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Cancelar e devolver estoque
-        with transaction.atomic():
-            order.status = 'cancelled'
-            order.save()
-            
-            for item in order.items.all():
-                Product.objects.filter(id=item.product.id).update(
-                    stock=F('stock') + item.quantity
-                )
+        # Cancelar e devolver estoque (falha se o pedido mudou de status no meio)
+        if not order.cancel(changed_by=request.user):
+            return Response(
+                {'error': 'Apenas pedidos pendentes podem ser cancelados.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             {'message': 'Pedido cancelado com sucesso. Estoque devolvido.'},
@@ -230,11 +271,23 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_orders(self, request):
         """
-        Retorna os pedidos do usuário autenticado
+        Retorna os pedidos do usuário autenticado (paginado por cursor)
         """
-        orders = Order.objects.filter(user=request.user)
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(user=request.user).with_details()
+        page = self.paginate_queryset(orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """
+        Pedidos arquivados (concluídos/cancelados antigos), paginados por cursor
+        Admin vê todos; cliente vê os próprios
+        """
+        page = self.paginate_queryset(self.get_archived_queryset())
+        return self.get_paginated_response([
+            {**archived.data, 'archived': True} for archived in page
+        ])
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def auto_process(self, request, pk=None):
@@ -244,16 +297,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         order = self.get_object()
         
-        if order.status == 'paid':
-            order.status = 'processing'
-            order.save()
-            
-            # Atualizar histórico
-            latest_history = order.status_history.first()
-            if latest_history:
-                latest_history.note = 'Transição automática após confirmação de pagamento'
-                latest_history.save()
-            
+        if order.status == 'paid' and order.transition_to(
+            'processing',
+            note='Transição automática após confirmação de pagamento'
+        ):
             return Response({'message': 'Pedido movido para processamento'})
         
         return Response({'message': 'Pedido não elegível para auto-processamento'})
@@ -56,6 +56,9 @@ class Payment(models.Model):
         verbose_name = 'Pagamento'
         verbose_name_plural = 'Pagamentos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='payment_created_cursor_idx'),
+        ]
     
     def __str__(self):
         return f"Pagamento #{self.id} - Pedido #{self.order.id}"
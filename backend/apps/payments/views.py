@@ -5,7 +5,9 @@ from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from .models import Payment
 from apps.orders.models import Order
+from apps.orders.idempotency import idempotent
 from .serializers import PaymentSerializer, CreatePaymentSerializer
+from mercadofree_backend.pagination import CreatedAtCursorPagination
 import uuid
 import random
 
@@ -16,6 +18,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
     """
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
     
     def get_queryset(self):
         user = self.request.user
@@ -23,10 +26,12 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Payment.objects.all()
         return Payment.objects.filter(order__user=user)
     
+    @idempotent('payments.create')
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         """
         Cria um pagamento (simulado)
+        Aceita cabeçalho Idempotency-Key (retentativas não duplicam o pagamento)
         """
         serializer = CreatePaymentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -74,6 +79,19 @@ class PaymentViewSet(viewsets.ModelViewSet):
         # 90% de chance de aprovação (simulação)
         is_approved = random.random() > 0.1
         
+        # Atualizar status do pedido (compare-and-set: perde se expirou/cancelou no meio)
+        if is_approved:
+            transitioned = order.transition_to('paid', changed_by=request.user)
+        else:
+            # Se rejeitado, devolver produtos ao estoque
+            transitioned = order.cancel(changed_by=request.user, note='Pagamento rejeitado')
+        
+        if not transitioned:
+            return Response(
+                {'error': 'Este pedido não está mais pendente.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
         payment = Payment.objects.create(
             order=order,
             method=method,
@@ -82,21 +100,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
             status='approved' if is_approved else 'rejected'
         )
         
-        # Atualizar status do pedido
-        if is_approved:
-            order.status = 'paid'
-            order.save()
-        else:
-            # Se rejeitado, devolver produtos ao estoque
-            order.status = 'cancelled'
-            order.save()
-            from django.db.models import F
-            from apps.products.models import Product
-            for item in order.items.all():
-                Product.objects.filter(id=item.product.id).update(
-                    stock=F('stock') + item.quantity
-                )
-        
         return Response(
             PaymentSerializer(payment).data,
             status=status.HTTP_201_CREATED
@@ -120,7 +123,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
         payment.save()
         
         # Atualizar pedido
-        payment.order.status = 'paid'
-        payment.order.save()
+        payment.order.transition_to('paid', changed_by=request.user)
         
         return Response(PaymentSerializer(payment).data)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib import messages
-from .models import Category, Product
+from .models import Category, Product, StockShard
 
 
 def limpar_todos_produtos(modeladmin, request, queryset):
@@ -29,6 +29,7 @@ def resetar_estoque_produtos(modeladmin, request, queryset):
     Reseta o estoque dos produtos selecionados para zero.
     """
     count = queryset.update(stock=0)
+    StockShard.objects.filter(product__in=queryset).update(stock=0)
     
     messages.success(
         request,
@@ -66,6 +67,61 @@ def desativar_produtos_selecionados(modeladmin, request, queryset):
 desativar_produtos_selecionados.short_description = '❌ Desativar produtos'
 
 
+def ativar_estoque_fragmentado(modeladmin, request, queryset):
+    """
+    Divide o estoque dos produtos selecionados em 8 shards (vendas relâmpago).
+    """
+    products = list(queryset.filter(sharded_stock=False))
+    for product in products:
+        product.enable_sharding(shards=8)
+    
+    messages.success(
+        request,
+        f'✅ Estoque de {len(products)} produto(s) dividido em 8 shards.'
+    )
+
+ativar_estoque_fragmentado.short_description = '🔀 Ativar estoque fragmentado (8 shards)'
+
+
+def redistribuir_shards(modeladmin, request, queryset):
+    """
+    Redistribui igualmente o estoque entre os shards dos produtos selecionados.
+    """
+    products = list(queryset.filter(sharded_stock=True))
+    for product in products:
+        StockShard.objects.rebalance(product)
+    
+    messages.success(
+        request,
+        f'✅ Shards de {len(products)} produto(s) redistribuídos.'
+    )
+
+redistribuir_shards.short_description = '⚖️ Redistribuir estoque entre shards'
+
+
+def desativar_estoque_fragmentado(modeladmin, request, queryset):
+    """
+    Junta os shards de volta em um único contador de estoque.
+    """
+    products = list(queryset.filter(sharded_stock=True))
+    for product in products:
+        product.disable_sharding()
+    
+    messages.success(
+        request,
+        f'✅ Estoque fragmentado desativado em {len(products)} produto(s).'
+    )
+
+desativar_estoque_fragmentado.short_description = '↩️ Desativar estoque fragmentado'
+
+
+class StockShardInline(admin.TabularInline):
+    model = StockShard
+    extra = 0
+    readonly_fields = ['index', 'stock']
+    can_delete = False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'created_at']
@@ -74,13 +130,18 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'stock', 'is_active', 'created_at']
-    list_filter = ['category', 'is_active', 'created_at']
-    search_fields = ['name', 'description']
+    list_display = ['name', 'sku', 'category', 'price', 'stock', 'is_active', 'sharded_stock', 'created_at']
+    list_filter = ['category', 'is_active', 'sharded_stock', 'created_at']
+    search_fields = ['name', 'description', '=sku']
     list_editable = ['price', 'stock', 'is_active']
     actions = [
         limpar_todos_produtos,
         resetar_estoque_produtos,
         ativar_produtos_selecionados,
-        desativar_produtos_selecionados
+        desativar_produtos_selecionados,
+        ativar_estoque_fragmentado,
+        redistribuir_shards,
+        desativar_estoque_fragmentado
     ]
+    readonly_fields = ['sharded_stock']
+    inlines = [StockShardInline]
@@ -0,0 +1,123 @@
+"""
+Cache das respostas do catálogo (produtos e categorias)
+
+As respostas de list/retrieve ficam em um LRU por processo, indexadas pela
+versão do catálogo + rota + parâmetros. Qualquer escrita em Product/Category
+incrementa a versão após o commit, o que invalida tudo de uma vez. A versão
+fica no cache do Django (compartilhado entre processos com Redis/Memcached).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    """Versão atual do catálogo (cresce a cada escrita confirmada)"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Começa pelo relógio (ms): se o cache perder a chave, a nova
+        # sequência não repete versões que já estão em LRUs de outros processos
+        cache.add(VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalida o catálogo quando a transação atual confirmar"""
+    transaction.on_commit(_increment_version)
+
+
+def _increment_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        catalog_version()
+        cache.incr(VERSION_KEY)
+
+
+def etag_for(data):
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+class CatalogCache:
+    """LRU de respostas do catálogo: chave -> (etag, data)"""
+    
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+    
+    def get(self, version, key):
+        with self.lock:
+            if version != self.version:
+                # Catálogo mudou: as respostas antigas nunca mais serão lidas
+                self.entries.clear()
+                self.version = version
+                return None
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+    
+    def set(self, version, key, entry):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = entry
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def respond(self, request, render):
+        """
+        Resposta do cache (ou de `render()`, guardada se for 200)
+        Responde 304 quando o If-None-Match do cliente bate com o ETag
+        """
+        version = catalog_version()
+        key = (
+            request.path,
+            tuple(sorted((name, tuple(values)) for name, values in request.query_params.lists())),
+            request.user.is_staff,  # admin também vê produtos inativos
+            request.get_host(),  # URLs absolutas das imagens
+            request.accepted_renderer.format,
+        )
+        
+        entry = self.get(version, key)
+        if entry is None:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (etag_for(response.data), response.data)
+            self.set(version, key, entry)
+        
+        etag, data = entry
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+
+catalog_cache = CatalogCache(max_entries=settings.CATALOG_CACHE['MAX_ENTRIES'])
+
+
+class CatalogCacheMixin:
+    """list/retrieve de ViewSet servidos pelo cache do catálogo"""
+    
+    def list(self, request, *args, **kwargs):
+        return catalog_cache.respond(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        return catalog_cache.respond(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
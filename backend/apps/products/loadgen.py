@@ -0,0 +1,133 @@
+"""
+Geração determinística de pedidos sintéticos (generate_load_data)
+
+Roda nos processos do pool, sem Django: recebe a especificação de um bloco
+de pedidos e devolve as linhas (tuplas na ordem das colunas pedidas) de
+pedidos, itens, histórico e pagamentos. O mesmo seed gera os mesmos dados.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from apps.orders.notes import EXPIRED_NOTE, format_refund_note
+
+# Pedidos antigos: só finalizados
+FINISHED_WEIGHTS = {'completed': 85, 'cancelled': 15}
+# Pedidos recentes (em andamento)
+ACTIVE_WEIGHTS = {'pending': 30, 'paid': 25, 'processing': 20, 'ready': 25}
+# Motivo do cancelamento: reserva expirada, pagamento rejeitado, cancelado após pagar
+CANCEL_WEIGHTS = {'expired': 60, 'rejected': 25, 'refunded': 15}
+
+PAYMENT_METHOD_WEIGHTS = {'pix': 50, 'credit_card': 35, 'debit_card': 10, 'boleto': 5}
+ITEMS_PER_ORDER_WEIGHTS = {1: 50, 2: 25, 3: 13, 4: 8, 5: 4}
+COUPON_RATE = 0.1
+
+STATUS_PATH = ['pending', 'paid', 'processing', 'ready', 'completed']
+
+
+def pick(rnd, weights):
+    return rnd.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def row(columns, defaults, values):
+    return tuple(values[name] if name in values else defaults[name] for name in columns)
+
+
+def generate_orders(spec):
+    """
+    Gera um bloco de pedidos
+    spec: seed, chunk, first_id, count, active_from, pickup_codes {id: código},
+    user_ids (início, fim), products [(id, preço)], coupons [(id, percentual)],
+    now (datetime UTC), days, columns {tabela: [...]}, defaults {tabela: {...}}
+    """
+    rnd = random.Random(spec['seed'] * 1_000_003 + spec['chunk'])
+    columns = spec['columns']
+    defaults = spec['defaults']
+    now = spec['now']
+    products = spec['products']
+    coupons = spec['coupons']
+    first_user, last_user = spec['user_ids']
+
+    tables = {'order': [], 'orderitem': [], 'history': [], 'payment': []}
+
+    for order_id in range(spec['first_id'], spec['first_id'] + spec['count']):
+        active = order_id >= spec['active_from']
+        if active:
+            status = pick(rnd, ACTIVE_WEIGHTS)
+            window = timedelta(minutes=9) if status == 'pending' else timedelta(days=2)
+            created_at = now - window * rnd.random()
+            pickup_code = spec['pickup_codes'][order_id]
+        else:
+            status = pick(rnd, FINISHED_WEIGHTS)
+            created_at = now - timedelta(days=spec['days'] * rnd.random(), minutes=10)
+            pickup_code = f'{rnd.randrange(10000):04d}'
+
+        # Itens: produtos mais populares saem mais (índices baixos)
+        subtotal = Decimal('0.00')
+        for _ in range(pick(rnd, ITEMS_PER_ORDER_WEIGHTS)):
+            product_id, price = products[int(len(products) * rnd.random() ** 2)]
+            quantity = rnd.choice((1, 1, 1, 2, 3))
+            subtotal += price * quantity
+            tables['orderitem'].append(row(columns['orderitem'], defaults['orderitem'], {
+                'order_id': order_id, 'product_id': product_id, 'quantity': quantity, 'price': price,
+            }))
+
+        coupon_id = None
+        discount = Decimal('0.00')
+        if coupons and rnd.random() < COUPON_RATE:
+            coupon_id, percent = rnd.choice(coupons)
+            discount = (subtotal * percent / 100).quantize(Decimal('0.01'))
+
+        method = pick(rnd, PAYMENT_METHOD_WEIGHTS)
+        installments = rnd.randint(1, 12) if method == 'credit_card' else 1
+
+        # Histórico: caminho normal até o status final
+        cancel_reason = pick(rnd, CANCEL_WEIGHTS) if status == 'cancelled' else None
+        if status == 'cancelled':
+            path = ['pending', 'paid', 'cancelled'] if cancel_reason == 'refunded' else ['pending', 'cancelled']
+        else:
+            path = STATUS_PATH[:STATUS_PATH.index(status) + 1]
+
+        changed_at = created_at
+        for position, step in enumerate(path):
+            if position:
+                changed_at += timedelta(minutes=10 if step == 'cancelled' else rnd.randint(1, 240))
+            note = None
+            if step == 'cancelled':
+                note = {
+                    'expired': EXPIRED_NOTE,
+                    'rejected': 'Pagamento rejeitado',
+                    'refunded': format_refund_note(changed_at),
+                }[cancel_reason]
+            tables['history'].append(row(columns['history'], defaults['history'], {
+                'order_id': order_id, 'status': step, 'note': note, 'created_at': changed_at,
+            }))
+        updated_at = changed_at
+
+        if 'paid' in path or cancel_reason == 'rejected':
+            paid_at = created_at + timedelta(minutes=rnd.randint(1, 9))
+            tables['payment'].append(row(columns['payment'], defaults['payment'], {
+                'order_id': order_id,
+                'method': method,
+                'status': 'rejected' if cancel_reason == 'rejected' else 'approved',
+                'amount': subtotal - discount,
+                'transaction_id': f'{rnd.getrandbits(128):032x}',
+                'created_at': paid_at,
+                'updated_at': paid_at,
+            }))
+
+        tables['order'].append(row(columns['order'], defaults['order'], {
+            'id': order_id,
+            'user_id': rnd.randint(first_user, last_user),
+            'status': status,
+            'payment_method': method,
+            'installments': installments,
+            'coupon_id': coupon_id,
+            'discount_amount': discount,
+            'total_amount': subtotal - discount,
+            'pickup_code': pickup_code,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'expires_at': created_at + timedelta(minutes=10),
+        }))
+
+    return tables
@@ -0,0 +1,93 @@
+import time
+from unittest import mock
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from apps.orders.models import Order
+from apps.orders.serializers import OrderSerializer, attach_order_details, order_list_rows
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer, product_list_rows
+from mercadofree_backend.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a renderização de listas de produtos e pedidos: '
+        'serializer do DRF + JSONRenderer x RowShape (.values()) + orjson'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000],
+            help='Quantidade de linhas de cada rodada (padrão: 100 1000 10000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repetições por rodada; vale o melhor tempo (padrão: 3)',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            ('Produtos', self.products_drf, self.products_fast, Product.objects.count()),
+            ('Pedidos', self.orders_drf, self.orders_fast, Order.objects.count()),
+        ]
+        largest = max(options['sizes'])
+        if any(count < largest for _, _, _, count in endpoints):
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Há menos de {largest} produtos ou pedidos; gere mais com '
+                f'python manage.py generate_load_data --scale N'
+            ))
+
+        for title, drf, fast, count in endpoints:
+            if not count:
+                raise CommandError(f'Sem dados para o benchmark ({title.lower()}).')
+            self.stdout.write(f'\n📊 {title}')
+            for size in options['sizes']:
+                # Mesmo relógio nos dois caminhos (time_remaining, is_expired)
+                with mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+                    if drf(size) != fast(size):
+                        raise CommandError(f'{title}: saídas diferentes com {size} linhas')
+
+                drf_time = self.best(drf, size, options['repeat'])
+                fast_time = self.best(fast, size, options['repeat'])
+                rows = min(size, count)
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ {rows:>6} linhas | DRF: {drf_time * 1000:8.1f} ms '
+                    f'({rows / drf_time:>9,.0f} linhas/s) | rápido: {fast_time * 1000:8.1f} ms '
+                    f'({rows / fast_time:>9,.0f} linhas/s) | {drf_time / fast_time:.1f}x'
+                ))
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Saídas idênticas byte a byte em todas as rodadas'))
+
+    def best(self, render, size, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render(size)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    # Mesma consulta da listagem (ordem do cursor), sem paginação
+
+    def products_drf(self, size):
+        queryset = Product.objects.select_related('category').defer('search_vector').order_by('-created_at', '-id')
+        return JSONRenderer().render(ProductListSerializer(queryset[:size], many=True).data)
+
+    def products_fast(self, size):
+        values = Product.objects.order_by('-created_at', '-id').values(*product_list_rows.lookups)
+        return FastJSONRenderer().render(product_list_rows.rows(values[:size]))
+
+    def orders_drf(self, size):
+        queryset = Order.objects.with_details().order_by('-created_at', '-id')
+        return JSONRenderer().render(OrderSerializer(queryset[:size], many=True).data)
+
+    def orders_fast(self, size):
+        values = Order.objects.order_by('-created_at', '-id').values(*order_list_rows.lookups)
+        data = order_list_rows.rows(values[:size])
+        attach_order_details(data)
+        return FastJSONRenderer().render(data)
@@ -0,0 +1,99 @@
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from apps.products.models import InsufficientStock, Product, StockShard
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara checkouts/s concorrentes em um único produto: '
+        'bloqueio da linha do produto x estoque fragmentado em shards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=16,
+            help='Checkouts simultâneos (padrão: 16)',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5.0,
+            help='Duração de cada rodada em segundos (padrão: 5)',
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=16,
+            help='Quantidade de shards do modo fragmentado (padrão: 16)',
+        )
+        parser.add_argument(
+            '--hold-ms',
+            type=float,
+            default=2.0,
+            help='Tempo simulado do restante da transação de checkout, em ms (padrão: 2)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(
+                self.style.WARNING('⚠️  Concorrência real exige PostgreSQL; resultados em outro banco não são representativos.')
+            )
+
+        product = Product.objects.create(
+            name='Benchmark estoque fragmentado',
+            description='Produto temporário do benchmark_stock_shards',
+            price=1,
+            stock=10_000_000,
+        )
+        try:
+            locked = self.run(self.checkout_locked, product, options)
+            product.enable_sharding(shards=options['shards'])
+            sharded = self.run(self.checkout_sharded, product, options)
+        finally:
+            product.delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✅ Bloqueio do produto: {locked:,.0f} checkouts/s\n'
+                f'✅ {options["shards"]} shards:         {sharded:,.0f} checkouts/s\n'
+                f'   Ganho: {sharded / locked if locked else 0:.1f}x'
+            )
+        )
+
+    def run(self, checkout, product, options):
+        hold = options['hold_ms'] / 1000
+        stop_at = time.monotonic() + options['seconds']
+        counts = []
+
+        def worker():
+            done = 0
+            try:
+                while time.monotonic() < stop_at:
+                    with transaction.atomic():
+                        checkout(product.pk)
+                        time.sleep(hold)
+                    done += 1
+            finally:
+                counts.append(done)
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return sum(counts) / options['seconds']
+
+    def checkout_locked(self, product_id):
+        product = Product.objects.select_for_update().get(pk=product_id)
+        if product.stock < 1:
+            raise InsufficientStock(product.stock)
+        Product.objects.adjust_stock({product_id: -1})
+
+    def checkout_sharded(self, product_id):
+        StockShard.objects.take(product_id, 1)
@@ -0,0 +1,74 @@
+from concurrent.futures import as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.orders.models import Order
+from apps.products.models import Product
+from mercadofree_backend.images import derivative_task, render_derivatives, spawn_pool
+
+# (modelo, campo de imagem) com derivadas
+IMAGE_FIELDS = [
+    (Product, 'image'),
+    (Order, 'release_image'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Gera as miniaturas WebP/JPEG das imagens já enviadas (produtos e comprovantes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Gera de novo mesmo as imagens que já têm derivadas',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.IMAGE_DERIVATIVES['WORKERS'],
+            help=f'Processos em paralelo (padrão: {settings.IMAGE_DERIVATIVES["WORKERS"]})',
+        )
+
+    def handle(self, *args, **options):
+        pending = []
+        for model, field in IMAGE_FIELDS:
+            rows = (
+                model.objects.exclude(**{f'{field}__isnull': True})
+                .exclude(**{field: ''})
+                .values_list('pk', field, f'{field}_variants')
+            )
+            for pk, name, variants in rows:
+                if options['force'] or variants.get('source') != name:
+                    pending.append((model, field, pk, name))
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('✅ Todas as imagens já têm derivadas.'))
+            return
+
+        self.stdout.write(f'🖼️  Gerando derivadas de {len(pending)} imagem(ns) com {options["workers"]} processo(s)...')
+
+        done = 0
+        failed = 0
+        with spawn_pool(options['workers']) as executor:
+            futures = {
+                executor.submit(render_derivatives, *derivative_task(name)): (model, field, pk, name)
+                for model, field, pk, name in pending
+            }
+            for future in as_completed(futures):
+                model, field, pk, name = futures[future]
+                try:
+                    widths = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'  ✗ {name}: {e}'))
+                    continue
+
+                model.objects.filter(pk=pk, **{field: name}).update(
+                    **{f'{field}_variants': {'source': name, 'widths': widths}}
+                )
+                done += 1
+                if done % 100 == 0:
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {done}/{len(pending)} imagens processadas'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Derivadas geradas para {done} imagem(ns)!'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  {failed} imagem(ns) com erro (arquivo ausente ou inválido)'))
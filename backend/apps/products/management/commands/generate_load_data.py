@@ -0,0 +1,307 @@
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from apps.coupons.cache import bump_coupons_version
+from apps.coupons.models import Coupon
+from apps.orders.models import Order, OrderItem, OrderStatusHistory, PickupCode
+from apps.payments.models import Payment
+from apps.products.cache import bump_catalog_version
+from apps.products.loadgen import generate_orders, row
+from apps.products.models import Category, Product, next_stock_version
+from apps.products.suggest import bump_names_version
+from mercadofree_backend.images import spawn_pool
+
+User = get_user_model()
+
+# Quantidades por unidade de --scale
+USERS_PER_SCALE = 1000
+PRODUCTS_PER_SCALE = 500
+COUPONS_PER_SCALE = 20
+ORDERS_PER_SCALE = 10000
+CATEGORIES = 20
+# Fração dos pedidos ainda em andamento (limitada aos códigos de retirada livres)
+ACTIVE_RATE = 0.02
+
+TABLES = {
+    'order': Order,
+    'orderitem': OrderItem,
+    'history': OrderStatusHistory,
+    'payment': Payment,
+}
+
+
+def columns_and_defaults(model, explicit_id=True):
+    """Colunas (attname) do INSERT e o valor padrão de cada uma"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if explicit_id or not field.primary_key
+    ]
+    return (
+        [field.attname for field in fields],
+        {field.attname: field.get_default() for field in fields},
+    )
+
+
+def copy_value(value):
+    """Valor no formato texto do COPY do PostgreSQL"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def insert_rows(model, columns, rows):
+    """COPY FROM STDIN no PostgreSQL; INSERT em lote (executemany) nos demais bancos"""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column_list = ', '.join(quote(model._meta.get_field(name).column) for name in columns)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for values in rows:
+                buffer.write('\t'.join(map(copy_value, values)))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({column_list}) FROM STDIN', buffer)
+        else:
+            fields = [model._meta.get_field(name) for name in columns]
+            placeholders = ', '.join(['%s'] * len(columns))
+            cursor.executemany(
+                f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})',
+                [
+                    [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)]
+                    for values in rows
+                ]
+            )
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos em escala (usuários, produtos, cupons, pedidos, itens, pagamentos e histórico) para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1,
+            help=(
+                f'Fator de escala: cada unidade gera {USERS_PER_SCALE} usuários, {PRODUCTS_PER_SCALE} produtos, '
+                f'{COUPONS_PER_SCALE} cupons e {ORDERS_PER_SCALE} pedidos (padrão: 1)'
+            ),
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (padrão: 42)')
+        parser.add_argument('--days', type=int, default=365, help='Período coberto pelos pedidos em dias (padrão: 365)')
+        parser.add_argument('--workers', type=int, default=4, help='Processos gerando pedidos em paralelo (padrão: 4)')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Pedidos por bloco/transação (padrão: 10000)')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self.rnd = random.Random(options['seed'])
+        self.now = timezone.now()
+        started = time.monotonic()
+
+        self.stdout.write(f'🏗️  Gerando dados sintéticos (escala {scale}, seed {options["seed"]}, {connection.vendor})...')
+
+        user_ids = self.create_users(USERS_PER_SCALE * scale)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {USERS_PER_SCALE * scale} usuários'))
+
+        products = self.create_products(PRODUCTS_PER_SCALE * scale)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {len(products)} produtos'))
+
+        coupons = self.create_coupons(COUPONS_PER_SCALE * scale)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {len(coupons)} cupons'))
+
+        totals = self.create_orders(ORDERS_PER_SCALE * scale, user_ids, products, coupons, options)
+
+        # IDs foram gravados explicitamente: ajusta as sequences (PostgreSQL)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Category, Product, Coupon, Order]):
+                cursor.execute(sql)
+
+        bump_catalog_version()
+        bump_names_version()
+        bump_coupons_version()
+
+        elapsed = time.monotonic() - started
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Dados gerados em {elapsed:.1f}s ({rows / elapsed:,.0f} linhas/s)'))
+        self.stdout.write(f'   • Pedidos: {totals["order"]}')
+        self.stdout.write(f'   • Itens: {totals["orderitem"]}')
+        self.stdout.write(f'   • Histórico: {totals["history"]}')
+        self.stdout.write(f'   • Pagamentos: {totals["payment"]}')
+
+    def create_users(self, count):
+        first_id = next_id(User)
+        columns, defaults = columns_and_defaults(User)
+        password = make_password('carga123')  # um hash só: o hasher é lento de propósito
+
+        with transaction.atomic():
+            insert_rows(User, columns, [
+                row(columns, defaults, {
+                    'id': user_id,
+                    'username': f'carga_{user_id}',
+                    'email': f'carga_{user_id}@example.com',
+                    'password': password,
+                    'first_name': 'Cliente',
+                    'last_name': str(user_id),
+                    'role': 'cliente',
+                    'date_joined': self.now - timedelta(days=self.rnd.randint(0, 720)),
+                })
+                for user_id in range(first_id, first_id + count)
+            ])
+        return first_id, first_id + count - 1
+
+    def create_products(self, count):
+        Category.objects.bulk_create(
+            [Category(name=f'Carga {index}') for index in range(1, CATEGORIES + 1)],
+            ignore_conflicts=True
+        )
+        category_ids = list(Category.objects.filter(name__startswith='Carga ').values_list('id', flat=True))
+
+        first_id = next_id(Product)
+        columns, defaults = columns_and_defaults(Product)
+        products = []
+        rows = []
+        with transaction.atomic():
+            # Carimbo da transação que grava os produtos (ver next_stock_version)
+            version = next_stock_version()
+            for product_id in range(first_id, first_id + count):
+                price = Decimal(round(self.rnd.lognormvariate(5, 1.2), 2)).quantize(Decimal('0.01'))
+                products.append((product_id, price))
+                rows.append(row(columns, defaults, {
+                    'id': product_id,
+                    'sku': f'CARGA-{product_id}',
+                    'name': f'Produto de carga {product_id}',
+                    'description': f'Produto sintético {product_id} para testes de carga',
+                    'price': price,
+                    'stock': self.rnd.randint(0, 500),
+                    'category_id': self.rnd.choice(category_ids),
+                    'stock_version': version,
+                    'created_at': self.now - timedelta(days=self.rnd.randint(0, 720)),
+                    'updated_at': self.now,
+                }))
+
+            insert_rows(Product, columns, rows)
+        return products
+
+    def create_coupons(self, count):
+        first_id = next_id(Coupon)
+        columns, defaults = columns_and_defaults(Coupon)
+        coupons = []
+        rows = []
+        for coupon_id in range(first_id, first_id + count):
+            percent = Decimal(self.rnd.choice((5, 10, 15, 20)))
+            coupons.append((coupon_id, percent))
+            rows.append(row(columns, defaults, {
+                'id': coupon_id,
+                'code': f'CARGA{coupon_id}',
+                'discount_type': 'percentage',
+                'discount_value': percent,
+                'valid_from': self.now - timedelta(days=400),
+                'valid_until': self.now + timedelta(days=30),
+                'created_at': self.now,
+                'updated_at': self.now,
+            }))
+
+        with transaction.atomic():
+            insert_rows(Coupon, columns, rows)
+        return coupons
+
+    def create_orders(self, count, user_ids, products, coupons, options):
+        first_id = next_id(Order)
+        free_codes = list(
+            PickupCode.objects.filter(order__isnull=True)
+            .order_by('sort_key')
+            .values_list('code', flat=True)[:int(count * ACTIVE_RATE)]
+        )
+        active_from = first_id + count - len(free_codes)
+        pickup_codes = dict(zip(range(active_from, first_id + count), free_codes))
+
+        columns = {}
+        defaults = {}
+        for table, model in TABLES.items():
+            columns[table], defaults[table] = columns_and_defaults(model, explicit_id=(model is Order))
+
+        chunk_size = options['chunk_size']
+        specs = []
+        for chunk, start in enumerate(range(first_id, first_id + count, chunk_size)):
+            size = min(chunk_size, first_id + count - start)
+            specs.append({
+                'seed': options['seed'],
+                'chunk': chunk,
+                'first_id': start,
+                'count': size,
+                'active_from': active_from,
+                'pickup_codes': {
+                    order_id: code for order_id, code in pickup_codes.items()
+                    if start <= order_id < start + size
+                },
+                'user_ids': user_ids,
+                'products': products,
+                'coupons': coupons,
+                'now': self.now,
+                'days': options['days'],
+                'columns': columns,
+                'defaults': defaults,
+            })
+
+        totals = dict.fromkeys(TABLES, 0)
+        started = time.monotonic()
+        with spawn_pool(options['workers']) as executor:
+            # No máximo 2 blocos por processo na fila: a memória não cresce com a escala
+            pending = []
+            specs = iter(specs)
+            while True:
+                while len(pending) < options['workers'] * 2:
+                    spec = next(specs, None)
+                    if spec is None:
+                        break
+                    pending.append(executor.submit(generate_orders, spec))
+                if not pending:
+                    break
+
+                tables = pending.pop(0).result()
+                with transaction.atomic():
+                    for table, model in TABLES.items():
+                        insert_rows(model, columns[table], tables[table])
+                        totals[table] += len(tables[table])
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ {totals["order"]}/{count} pedidos ({totals["order"] / elapsed:,.0f} pedidos/s)'
+                ))
+
+        PickupCode.objects.bind([Order(pk=order_id, pickup_code=code) for order_id, code in pickup_codes.items()])
+
+        used = (
+            Order.objects.filter(coupon_id=OuterRef('pk'))
+            .values('coupon_id')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        Coupon.objects.filter(id__in=[coupon_id for coupon_id, _ in coupons]).update(
+            used_count=Coalesce(Subquery(used), 0)
+        )
+        return totals
@@ -0,0 +1,205 @@
+import csv
+import hashlib
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.products.cache import bump_catalog_version
+from apps.products.models import Category, Product, StockShard
+from apps.products.suggest import bump_names_version
+
+# Colunas gravadas quando um SKU já existe
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'stock', 'category', 'is_active',
+    'import_hash', 'stock_version', 'updated_at',
+]
+
+TRUE_VALUES = {'1', 'true', 'sim', 'yes', 's', 'y'}
+
+
+class InvalidRow(Exception):
+    pass
+
+
+def read_csv(file, delimiter):
+    yield from csv.DictReader(file, delimiter=delimiter)
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # Linha quebrada não interrompe o arquivo: vira erro no lote
+                yield InvalidRow(f'JSON inválido ({e.msg})')
+
+
+def parse_row(row):
+    """Normaliza uma linha do feed: (sku, campos, nome da categoria)"""
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku or not name:
+        raise InvalidRow('sku e name são obrigatórios')
+    
+    try:
+        price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+        stock = int(row.get('stock') or 0)
+    except (InvalidOperation, TypeError, ValueError):
+        raise InvalidRow('price/stock inválidos')
+    if price < 0 or stock < 0:
+        raise InvalidRow('price/stock negativos')
+    
+    is_active = row.get('is_active', True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() in TRUE_VALUES
+    
+    fields = {
+        'name': name[:200],
+        'description': str(row.get('description') or ''),
+        'price': price,
+        'stock': stock,
+        'is_active': bool(is_active),
+    }
+    category = str(row.get('category') or '').strip()[:100]
+    return sku[:64], fields, category
+
+
+def content_hash(fields, category):
+    content = json.dumps(
+        [fields['name'], fields['description'], str(fields['price']), fields['stock'], fields['is_active'], category],
+        ensure_ascii=False
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Importa/atualiza produtos de um arquivo CSV ou JSONL do fornecedor (upsert por SKU)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo .csv ou .jsonl (colunas: sku, name, description, price, stock, category, is_active)')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Formato do arquivo (padrão: pela extensão)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Linhas gravadas por transação (padrão: 2000)',
+        )
+        parser.add_argument(
+            '--delimiter',
+            default=',',
+            help='Separador do CSV (padrão: ,)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        # Uma consulta para todas as categorias; as novas entram no mesmo dicionário
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+
+        self.stdout.write(f'📦 Importando {path} ({file_format})...')
+        started = time.monotonic()
+        processed = 0
+
+        try:
+            file = open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Não foi possível abrir {path}: {e}')
+
+        with file:
+            rows = read_jsonl(file) if file_format == 'jsonl' else read_csv(file, options['delimiter'])
+            numbered = enumerate(rows, start=1)
+            while True:
+                batch = list(islice(numbered, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                processed += len(batch)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    self.style.SUCCESS(f'  ✓ {processed} linhas ({processed / elapsed:,.0f} linhas/s)')
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Importação concluída em {elapsed:.1f}s ({processed / max(elapsed, 1e-9):,.0f} linhas/s)'))
+        self.stdout.write(f'   • Criados: {self.totals["created"]}')
+        self.stdout.write(f'   • Atualizados: {self.totals["updated"]}')
+        self.stdout.write(f'   • Sem alteração: {self.totals["unchanged"]}')
+        if self.totals['errors']:
+            self.stdout.write(self.style.WARNING(f'   • Linhas com erro: {self.totals["errors"]}'))
+
+    def import_batch(self, batch):
+        parsed = {}
+        for line, row in batch:
+            try:
+                if isinstance(row, InvalidRow):
+                    raise row
+                sku, fields, category = parse_row(row)
+            except (InvalidRow, AttributeError) as e:
+                self.totals['errors'] += 1
+                self.stdout.write(self.style.ERROR(f'  ✗ Linha {line}: {e}'))
+                continue
+            parsed[sku] = (fields, category)  # SKU repetido no lote: vale a última linha
+
+        with transaction.atomic():
+            existing = {
+                sku: (import_hash, sharded)
+                for sku, import_hash, sharded in Product.objects.filter(sku__in=parsed.keys())
+                .values_list('sku', 'import_hash', 'sharded_stock')
+            }
+            self.ensure_categories({category for _, category in parsed.values() if category})
+
+            now = timezone.now()
+            products = []
+            sharded = []
+            for sku, (fields, category) in parsed.items():
+                import_hash = content_hash(fields, category)
+                current = existing.get(sku)
+                if current and current[0] == import_hash:
+                    self.totals['unchanged'] += 1
+                    continue
+
+                self.totals['updated' if current else 'created'] += 1
+                if current and current[1]:
+                    sharded.append(sku)
+                products.append(Product(
+                    sku=sku,
+                    category_id=self.categories.get(category),
+                    import_hash=import_hash,
+                    updated_at=now,
+                    **fields
+                ))
+
+            if products:
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=UPDATE_FIELDS,
+                )
+
+            # Estoque fragmentado: o novo total é redistribuído entre os shards
+            for product in Product.objects.filter(sku__in=sharded):
+                StockShard.objects.rebalance(product, total=product.stock)
+
+            if products:
+                # Cada lote confirmado já aparece no catálogo e no autocomplete
+                # de todos os processos
+                bump_catalog_version()
+                bump_names_version()
+
+    def ensure_categories(self, names):
+        missing = names - self.categories.keys()
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
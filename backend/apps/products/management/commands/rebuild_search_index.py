@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from apps.products.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recria os triggers e o índice da busca de produtos (?q=) e reindexa o catálogo'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Reindexando produtos...')
+
+        with transaction.atomic():
+            install_search_index(connection)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Índice de busca recriado ({connection.vendor})!')
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_created_cursor_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sharded_stock',
+            field=models.BooleanField(default=False, help_text='Divide o estoque em vários contadores (StockShard) para vendas concorrentes', verbose_name='Estoque Fragmentado'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Índice')),
+                ('stock', models.PositiveIntegerField(default=0, verbose_name='Estoque')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Estoque',
+                'verbose_name_plural': 'Fragmentos de Estoque',
+                'constraints': [models.UniqueConstraint(fields=('product', 'index'), name='stock_shard_product_index_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+import apps.products.models
+from django.db import migrations, models
+
+from apps.products.search import install_search_index
+
+
+def reinstall_sqlite_search_index(apps, schema_editor):
+    # No SQLite, adicionar coluna NOT NULL recria a tabela e apaga os triggers da busca
+    if schema_editor.connection.vendor == 'sqlite':
+        install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_version',
+            field=models.BigIntegerField(default=apps.products.models.next_stock_version, editable=False, verbose_name='Versão do Estoque'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_version'], name='product_stock_version_idx'),
+        ),
+        migrations.RunPython(reinstall_sqlite_search_index, migrations.RunPython.noop),
+    ]
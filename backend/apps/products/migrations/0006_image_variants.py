@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:08
+
+from django.db import migrations, models
+
+from apps.products.search import install_search_index
+
+
+def reinstall_sqlite_search_index(apps, schema_editor):
+    # No SQLite, adicionar coluna NOT NULL recria a tabela e apaga os triggers da busca
+    if schema_editor.connection.vendor == 'sqlite':
+        install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_stock_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(reinstall_sqlite_search_index, migrations.RunPython.noop),
+    ]
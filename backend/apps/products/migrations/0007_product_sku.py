@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+from apps.products.search import install_search_index
+
+
+def reinstall_sqlite_search_index(apps, schema_editor):
+    # No SQLite, adicionar coluna UNIQUE/NOT NULL recria a tabela e apaga os triggers da busca
+    if schema_editor.connection.vendor == 'sqlite':
+        install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Código do fornecedor; chave do import_catalog', max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+        migrations.RunPython(reinstall_sqlite_search_index, migrations.RunPython.noop),
+    ]
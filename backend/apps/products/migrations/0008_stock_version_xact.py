@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:48
+
+from django.db import migrations, models
+
+from apps.products.search import install_search_index
+
+
+def reset_stock_versions(apps, schema_editor):
+    # Versões do relógio (µs) ficariam à frente dos ids de transação para sempre
+    Product = apps.get_model('products', 'Product')
+    Product.objects.update(stock_version=0)
+
+
+def reinstall_sqlite_search_index(apps, schema_editor):
+    # No SQLite, alterar a coluna recria a tabela e apaga os triggers da busca
+    if schema_editor.connection.vendor == 'sqlite':
+        install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_sku'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Versão do Estoque'),
+        ),
+        migrations.RunPython(reset_stock_versions, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_sqlite_search_index, migrations.RunPython.noop),
+    ]
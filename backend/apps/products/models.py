@@ -1,4 +1,100 @@
-from django.db import models
+import time
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from mercadofree_backend.deferred import DeferredSync
+from mercadofree_backend.images import schedule_derivatives
+from .cache import bump_catalog_version
+from .suggest import CATEGORY, PRODUCT, bump_names_version, suggest_index
+
+# Campos que mudam o que o autocomplete mostra
+SUGGEST_FIELDS = {'name', 'is_active'}
+
+# Campos enviados pela sincronização incremental de estoque (/api/products/stock/)
+STOCK_FIELDS = {'stock', 'is_active'}
+
+
+# Fora do PostgreSQL a versão é o relógio: uma transação pode carimbar e
+# confirmar um pouco depois, então o cursor devolvido fica esse tanto para trás
+STOCK_VERSION_SETTLE = 2_000_000  # µs
+
+# Máximo de produtos por resposta da sincronização de estoque (o resto vem em páginas)
+STOCK_SYNC_LIMIT = 500
+
+
+# Faixas de preço das facetas (/api/products/facets/): [início, fim)
+PRICE_BUCKETS = [0, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+def next_stock_version(using='default'):
+    """
+    Versão de estoque das escritas da transação atual (chame dentro dela)
+    PostgreSQL: id da transação (pg_current_xact_id); outros bancos: relógio em µs
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return time.time_ns() // 1000
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_current_xact_id()::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def stock_cursor(using='default'):
+    """
+    Versão abaixo da qual todas as escritas de estoque já confirmaram
+    PostgreSQL: xmin do snapshot atual, a menor transação ainda em andamento;
+    a ordem de confirmação não importa, e uma transação longa só segura o
+    cursor (o que vier depois dele é reenviado). Outros bancos: relógio menos
+    STOCK_VERSION_SETTLE
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return time.time_ns() // 1000 - STOCK_VERSION_SETTLE
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+class StockVersion(models.Func):
+    """next_stock_version calculada pelo banco no próprio UPDATE/INSERT"""
+    output_field = models.BigIntegerField()
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        return '%s', [time.time_ns() // 1000]
+    
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return 'pg_current_xact_id()::text::bigint', []
+
+
+class CatalogQuerySet(models.QuerySet):
+    """
+    Escritas em lote no catálogo invalidam o cache de respostas e, se mexem
+    em nomes, o índice do autocomplete
+    (save/delete de instâncias ficam nos próprios modelos)
+    """
+    
+    def update(self, **kwargs):
+        bump_catalog_version()
+        if SUGGEST_FIELDS & kwargs.keys():
+            bump_names_version()
+        return super().update(**kwargs)
+    
+    def delete(self):
+        bump_catalog_version()
+        bump_names_version()
+        return super().delete()
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        bump_catalog_version()
+        bump_names_version()
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        bump_catalog_version()
+        if SUGGEST_FIELDS & set(fields):
+            bump_names_version()
+        return super().bulk_update(objs, fields, *args, **kwargs)
 
 
 class Category(models.Model):
@@ -9,6 +105,8 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True, verbose_name='Descrição')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     
+    objects = CatalogQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Categoria'
         verbose_name_plural = 'Categorias'
@@ -16,12 +114,181 @@ class Category(models.Model):
     
     def __str__(self):
         return self.name
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda o nome carregado: o autocomplete só muda se ele mudar"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        bump_catalog_version()
+        super().save(*args, **kwargs)
+        if self.name != getattr(self, '_loaded_name', None):
+            suggest_index.update(CATEGORY, self.pk, self.name)
+            self._loaded_name = self.name
+    
+    def delete(self, *args, **kwargs):
+        bump_catalog_version()
+        suggest_index.update(CATEGORY, self.pk)
+        return super().delete(*args, **kwargs)
+
+
+class ProductQuerySet(CatalogQuerySet):
+    """Toda escrita em estoque/ativo carimba a stock_version da transação"""
+    
+    def update(self, **kwargs):
+        if STOCK_FIELDS & kwargs.keys():
+            kwargs['stock_version'] = StockVersion()
+        return super().update(**kwargs)
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            version = next_stock_version(self.db)
+            for obj in objs:
+                obj.stock_version = version
+            return super().bulk_create(objs, *args, **kwargs)
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if STOCK_FIELDS & set(fields):
+            objs = list(objs)
+            for obj in objs:
+                obj.stock_version = StockVersion()
+            fields = [*fields, 'stock_version']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+    
+    def facets(self):
+        """
+        Contagens por categoria, faixa de preço e disponibilidade
+        Um único GROUP BY (categoria, faixa, em estoque); os totais de cada
+        faceta são somados a partir das linhas agrupadas
+        """
+        bounds = list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None]))
+        bucket = Case(
+            *[
+                When(Q(price__gte=low) & Q(price__lt=high), then=Value(index))
+                for index, (low, high) in enumerate(bounds[:-1])
+            ],
+            default=Value(len(bounds) - 1),
+            output_field=models.IntegerField()
+        )
+        rows = (
+            self.order_by()
+            .annotate(price_bucket=bucket, available=Q(stock__gt=0))
+            .values('category_id', 'category__name', 'price_bucket', 'available')
+            .annotate(count=Count('id'))
+        )
+        
+        categories = {}
+        price_counts = [0] * len(bounds)
+        availability = {'in_stock': 0, 'out_of_stock': 0}
+        for row in rows:
+            category = categories.setdefault(
+                row['category_id'],
+                {'id': row['category_id'], 'name': row['category__name'], 'count': 0}
+            )
+            category['count'] += row['count']
+            price_counts[row['price_bucket']] += row['count']
+            availability['in_stock' if row['available'] else 'out_of_stock'] += row['count']
+        
+        return {
+            'total': sum(price_counts),
+            'categories': sorted(categories.values(), key=lambda category: (category['name'] is None, category['name'] or '')),
+            'price_ranges': [
+                {'min': low, 'max': high, 'count': count}
+                for (low, high), count in zip(bounds, price_counts)
+                if count
+            ],
+            'availability': availability,
+        }
+    
+    def stock_changes(self, since=None, after=None, limit=STOCK_SYNC_LIMIT):
+        """
+        Mudanças de estoque a partir da versão `since` (sem `since`: só o cursor
+        atual), até `limit` produtos em ordem de (versão, id)
+        `after`: id do último produto da página anterior com versão `since`
+        Retorna {version, after, more, changes: [(id, estoque, ativo), ...]};
+        a próxima consulta envia `version` e `after`. Pode reenviar mudanças
+        (aplicar de novo não tem efeito), nunca perde uma
+        """
+        cursor = stock_cursor(self.db)
+        if since is None:
+            return {'version': cursor, 'after': None, 'more': False, 'changes': []}
+        if since > cursor:
+            # Versão que o banco ainda não deu (ex.: do relógio antigo): recomeça
+            since, after = 0, None
+        
+        if after is None:
+            queryset = self.filter(stock_version__gte=since)
+        else:
+            queryset = self.filter(Q(stock_version__gt=since) | Q(stock_version=since, id__gt=after))
+        rows = list(
+            queryset.order_by('stock_version', 'id')
+            .values_list('stock_version', 'id', 'stock', 'is_active')[:limit + 1]
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        
+        version, after = cursor, None
+        if more and rows[-1][0] < cursor:
+            # Página cheia: continua depois da última linha (versões abaixo do
+            # cursor já confirmaram, nada mais entra antes dela)
+            version, after = rows[-1][0], rows[-1][1]
+        else:
+            # O que faltou tem versão >= cursor e volta na próxima consulta
+            more = False
+        return {
+            'version': version,
+            'after': after,
+            'more': more,
+            'changes': [row[1:] for row in rows],
+        }
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """
+    Manager de produtos com operações de estoque em lote
+    """
+    
+    def adjust_stock(self, deltas):
+        """
+        Aplica variações de estoque {product_id: delta} em um único UPDATE
+        Delta negativo reserva, positivo devolve ao estoque
+        Devoluções de produtos com estoque fragmentado vão para um shard
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        
+        sharded = set(self.filter(id__in=deltas.keys(), sharded_stock=True).values_list('id', flat=True))
+        for pk in sharded:
+            StockShard.objects.restock(pk, deltas.pop(pk))
+        if not deltas:
+            return len(sharded)
+        
+        return len(sharded) + self.filter(id__in=deltas.keys()).update(
+            stock=F('stock') + Case(
+                *[When(id=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                default=Value(0),
+                output_field=models.IntegerField()
+            )
+        )
 
 
 class Product(models.Model):
     """
     Produtos disponíveis na loja
     """
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='SKU',
+        help_text='Código do fornecedor; chave do import_catalog'
+    )
     name = models.CharField(max_length=200, verbose_name='Nome')
     description = models.TextField(verbose_name='Descrição')
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Preço')
@@ -39,18 +306,231 @@ class Product(models.Model):
         null=True,
         verbose_name='Imagem'
     )
+    # Hash do conteúdo da última importação (import_catalog pula linhas iguais)
+    import_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
+    # Miniaturas da imagem: {"source": nome da imagem, "widths": [160, 320, ...]}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True, verbose_name='Ativo')
+    sharded_stock = models.BooleanField(
+        default=False,
+        verbose_name='Estoque Fragmentado',
+        help_text='Divide o estoque em vários contadores (StockShard) para vendas concorrentes'
+    )
+    # Carimbada a cada escrita em estoque/ativo (ProductQuerySet, save)
+    stock_version = models.BigIntegerField(default=0, editable=False, verbose_name='Versão do Estoque')
+    # Preenchida por trigger no PostgreSQL, com índice GIN (ver apps.products.search)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
+    objects = ProductManager()
+    
     class Meta:
         verbose_name = 'Produto'
         verbose_name_plural = 'Produtos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_cursor_idx'),
+            models.Index(fields=['stock_version'], name='product_stock_version_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda estoque, imagem e campos do autocomplete carregados para detectar edições"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock = instance.__dict__.get('stock')
+        instance._loaded_image = instance.__dict__.get('image')
+        instance._loaded_suggest = (instance.__dict__.get('name'), instance.__dict__.get('is_active'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """
+        Em estoque fragmentado, uma edição manual de `stock` é
+        redistribuída entre os shards
+        Imagem nova: miniaturas geradas em segundo plano
+        """
+        stock_edited = self.stock != getattr(self, '_loaded_stock', self.stock)
+        bump_catalog_version()
+        with transaction.atomic():
+            self.stock_version = StockVersion()
+            super().save(*args, **kwargs)
+            del self.stock_version  # valor calculado pelo banco: relido se for acessado
+            if self.sharded_stock and stock_edited:
+                StockShard.objects.rebalance(self, total=self.stock)
+            elif self.sharded_stock:
+                StockShard.objects.schedule_sync([self.pk])
+            # Só nome/ativo mudam o autocomplete (e fazem os outros processos reconstruí-lo)
+            if (self.name, self.is_active) != getattr(self, '_loaded_suggest', None):
+                suggest_index.update(PRODUCT, self.pk, self.name if self.is_active else None)
+            if self.image.name != getattr(self, '_loaded_image', None):
+                schedule_derivatives(self, 'image')
+        self._loaded_stock = self.stock
+        self._loaded_image = self.image.name
+        self._loaded_suggest = (self.name, self.is_active)
+    
+    def delete(self, *args, **kwargs):
+        bump_catalog_version()
+        suggest_index.update(PRODUCT, self.pk)
+        return super().delete(*args, **kwargs)
+    
     @property
     def in_stock(self):
         return self.stock > 0
+    
+    def enable_sharding(self, shards=8):
+        """Divide o estoque atual em `shards` contadores"""
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(pk=self.pk)
+            StockShard.objects.filter(product=product).delete()
+            StockShard.objects.bulk_create([
+                StockShard(product=product, index=index, stock=0)
+                for index in range(shards)
+            ])
+            Product.objects.filter(pk=self.pk).update(sharded_stock=True)
+            self.sharded_stock = True
+            StockShard.objects.rebalance(self, total=product.stock)
+    
+    def disable_sharding(self):
+        """Junta os shards de volta no campo `stock`"""
+        with transaction.atomic():
+            shards = StockShard.objects.select_for_update().filter(product_id=self.pk)
+            total = shards.aggregate(total=Sum('stock'))['total'] or 0
+            shards.delete()
+            Product.objects.filter(pk=self.pk).update(sharded_stock=False, stock=total)
+            self.sharded_stock = False
+            self.stock = self._loaded_stock = total
+
+
+class InsufficientStock(Exception):
+    """Os shards não têm estoque suficiente para a quantidade pedida"""
+    
+    def __init__(self, available):
+        super().__init__(available)
+        self.available = available
+
+
+class StockShardManager(models.Manager):
+    """
+    Operações de estoque fragmentado: checkouts concorrentes do mesmo produto
+    bloqueiam shards diferentes em vez de disputar a linha do produto
+    """
+    
+    def take(self, product_id, quantity):
+        """
+        Retira `quantity` de shards aleatórios que ainda tenham estoque
+        Shards bloqueados por outros checkouts são pulados (SKIP LOCKED); só se
+        eles não bastarem, espera pelos demais. Levanta InsufficientStock.
+        """
+        remaining = quantity
+        visited = []
+        
+        for skip_locked in (True, False):
+            while remaining > 0:
+                shard = (
+                    self.select_for_update(skip_locked=skip_locked)
+                    .filter(product_id=product_id, stock__gt=0)
+                    .exclude(id__in=visited)
+                    .order_by('?')
+                    .first()
+                )
+                if shard is None:
+                    break
+                
+                taken = min(shard.stock, remaining)
+                self.filter(id=shard.id).update(stock=F('stock') - taken)
+                visited.append(shard.id)
+                remaining -= taken
+        
+        if remaining > 0:
+            raise InsufficientStock(quantity - remaining)
+        
+        self.schedule_sync([product_id])
+    
+    def restock(self, product_id, quantity):
+        """Devolve `quantity` a um shard aleatório"""
+        shard_id = (
+            self.filter(product_id=product_id)
+            .order_by('?')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if shard_id is None:
+            # Fragmentação desligada enquanto o pedido estava aberto: devolve ao produto
+            if Product.objects.filter(pk=product_id, sharded_stock=False).update(stock=F('stock') + quantity):
+                return
+            # Ainda fragmentado, mas sem shards (apagados no admin): recria um
+            shard_id = self.create(product_id=product_id, index=0).id
+        self.filter(id=shard_id).update(stock=F('stock') + quantity)
+        self.schedule_sync([product_id])
+    
+    def rebalance(self, product, total=None):
+        """
+        Redistribui o estoque igualmente entre os shards do produto
+        `total` substitui o estoque atual (edição manual no admin)
+        """
+        with transaction.atomic():
+            shards = list(self.select_for_update().filter(product_id=product.pk).order_by('index'))
+            if not shards:
+                return
+            
+            if total is None:
+                total = sum(shard.stock for shard in shards)
+            
+            base, extra = divmod(total, len(shards))
+            for position, shard in enumerate(shards):
+                shard.stock = base + (1 if position < extra else 0)
+            self.bulk_update(shards, ['stock'])
+            
+            Product.objects.filter(pk=product.pk).update(stock=total)
+    
+    def schedule_sync(self, product_ids):
+        """
+        Atualiza Product.stock com a soma dos shards após o commit, agrupando
+        os produtos alterados em um UPDATE a cada SHARD_SYNC['INTERVAL_MS']
+        (mercadofree_backend.deferred): checkouts não disputam a linha do produto
+        """
+        stock_sync.schedule(product_ids)
+    
+    def sync(self, product_ids):
+        totals = (
+            self.filter(product_id=OuterRef('pk'))
+            .values('product_id')
+            .annotate(total=Sum('stock'))
+            .values('total')
+        )
+        return Product.objects.filter(id__in=product_ids, sharded_stock=True).update(
+            stock=Coalesce(Subquery(totals), 0)
+        )
+
+
+class StockShard(models.Model):
+    """
+    Contador parcial de estoque de um produto com estoque fragmentado
+    Product.stock guarda a soma dos shards para leitura
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_shards',
+        verbose_name='Produto'
+    )
+    index = models.PositiveSmallIntegerField(verbose_name='Índice')
+    stock = models.PositiveIntegerField(default=0, verbose_name='Estoque')
+    
+    objects = StockShardManager()
+    
+    class Meta:
+        verbose_name = 'Fragmento de Estoque'
+        verbose_name_plural = 'Fragmentos de Estoque'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='stock_shard_product_index_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product} #{self.index}: {self.stock}"
+
+
+stock_sync = DeferredSync(lambda product_ids: StockShard.objects.sync(product_ids))
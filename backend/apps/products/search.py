@@ -0,0 +1,135 @@
+"""
+Busca textual de produtos com ranking (?q=)
+
+PostgreSQL: coluna tsvector mantida por trigger (dicionário portuguese, nome
+com peso A e descrição com peso B) + índice GIN, ordenada por ts_rank.
+SQLite: tabela virtual FTS5 mantida por triggers, ordenada por bm25.
+Outros bancos: ILIKE sem ranking.
+
+Os triggers atualizam o índice em qualquer INSERT/UPDATE (save, update em
+lote, bulk_create), sem depender do código Python.
+"""
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'portuguese'
+
+POSTGRES_INSTALL = [
+    f"""
+    CREATE OR REPLACE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product",
+    """
+    CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector()
+    """,
+    # Dispara o trigger em todas as linhas já existentes
+    "UPDATE products_product SET name = name",
+    "CREATE INDEX IF NOT EXISTS product_search_vector_idx ON products_product USING gin (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS product_search_vector_idx",
+    "DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product",
+    "DROP FUNCTION IF EXISTS products_product_search_vector()",
+]
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5(
+        name, description,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_delete AFTER DELETE ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_update AFTER UPDATE OF name, description ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS products_product_fts_insert",
+    "DROP TRIGGER IF EXISTS products_product_fts_delete",
+    "DROP TRIGGER IF EXISTS products_product_fts_update",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+INSTALL = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}
+UNINSTALL = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}
+
+
+def install_search_index(connection):
+    """Cria (ou recria) triggers e índice e reindexa todos os produtos"""
+    with connection.cursor() as cursor:
+        for sql in INSTALL.get(connection.vendor, []):
+            cursor.execute(sql)
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        for sql in UNINSTALL.get(connection.vendor, []):
+            cursor.execute(sql)
+
+
+def fts5_query(text):
+    """Termos como prefixos entre aspas (E implícito); sem operadores do usuário"""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', text))
+
+
+def search_products(queryset, text):
+    """Filtra `queryset` pelos produtos que casam com `text`, mais relevantes primeiro"""
+    vendor = connections[queryset.db].vendor
+    
+    if vendor == 'postgresql':
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-id')
+        )
+    
+    if vendor == 'sqlite':
+        match = fts5_query(text)
+        if not match:
+            return queryset.none()
+        return (
+            queryset.filter(id__in=RawSQL(
+                'SELECT rowid FROM products_product_fts WHERE products_product_fts MATCH %s',
+                (match,)
+            ))
+            .annotate(rank=RawSQL(
+                'SELECT bm25(products_product_fts, 10.0, 1.0) FROM products_product_fts '
+                'WHERE products_product_fts MATCH %s AND rowid = products_product.id',
+                (match,)
+            ))
+            .order_by('rank', '-id')  # bm25: menor é mais relevante
+        )
+    
+    return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
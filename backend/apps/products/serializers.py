@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from mercadofree_backend.fastlist import RowShape
+from mercadofree_backend.images import ImageSrcsetField
 from .models import Category, Product
 
 
@@ -12,21 +14,31 @@ class CategorySerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     in_stock = serializers.BooleanField(read_only=True)
+    image_srcset = ImageSrcsetField('image')
     
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'stock',
-            'category', 'category_name', 'image', 'is_active',
+            'id', 'sku', 'name', 'description', 'price', 'stock',
+            'category', 'category_name', 'image', 'image_srcset', 'is_active',
             'in_stock', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_sku(self, value):
+        """SKU vazio vira nulo (vários produtos sem SKU não conflitam no UNIQUE)"""
+        return value or None
 
 
 class ProductListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listagem de produtos"""
     category_name = serializers.CharField(source='category.name', read_only=True)
+    image_srcset = ImageSrcsetField('image')
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'stock', 'category_name', 'image', 'is_active']
+        fields = ['id', 'name', 'price', 'stock', 'category_name', 'image', 'image_srcset', 'is_active']
+
+
+# Listagem rápida (FAST_LIST_RENDERER): mesma saída do ProductListSerializer
+product_list_rows = RowShape(ProductListSerializer)
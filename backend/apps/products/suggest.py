@@ -0,0 +1,203 @@
+"""
+Índice de prefixos para o autocomplete da busca (/api/products/suggest/)
+
+Arrays ordenados de chaves normalizadas (minúsculas, sem acento), com uma
+chave por início de palavra do nome: "Smartphone Samsung" responde tanto a
+"smar" quanto a "sams". A busca é um bisect, sem consultar o banco. Nomes
+que começam pelo prefixo vêm antes dos que só têm outra palavra casando
+(o nome igual ao prefixo é o primeiro), por isso os inícios de nome e as
+demais palavras ficam em arrays separados.
+
+Cada processo monta o índice ao subir o servidor (mercadofree_backend.wsgi)
+e o atualiza a cada save/delete de Product/Category feito nele. Escritas em
+lote e escritas de outros processos incrementam a versão de nomes (cache do
+Django); o processo que encontra uma versão nova reconstrói o índice.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+NAMES_VERSION_KEY = 'catalog:names_version'
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços simples"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(folded.lower().split())
+
+
+def word_keys(name):
+    """Uma chave por início de palavra: 'a b c' -> ['a b c', 'b c', 'c']"""
+    normalized = normalize(name)
+    return [
+        normalized[position:]
+        for position, char in enumerate(normalized)
+        if char != ' ' and (position == 0 or normalized[position - 1] == ' ')
+    ]
+
+
+def names_version():
+    version = cache.get(NAMES_VERSION_KEY)
+    if version is None:
+        cache.add(NAMES_VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(NAMES_VERSION_KEY)
+    return version
+
+
+class KeyArray:
+    """Chaves ordenadas e as entradas (chave, tipo, id) na mesma ordem"""
+    
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+        self.keys = [entry[0] for entry in self.entries]
+    
+    def insert(self, entry):
+        position = bisect_left(self.entries, entry)
+        self.entries.insert(position, entry)
+        self.keys.insert(position, entry[0])
+    
+    def remove(self, entry):
+        position = bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+            del self.keys[position]
+    
+    def matching(self, prefix):
+        """Entradas cuja chave começa por `prefix`, em ordem alfabética"""
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            yield self.entries[position]
+            position += 1
+
+
+class SuggestIndex:
+    
+    def __init__(self):
+        self.starts = KeyArray()  # nomes inteiros (primeira palavra)
+        self.words = KeyArray()  # a partir das demais palavras
+        self.names = {}  # (tipo, id) -> nome exibido
+        self.version = None
+        self.lock = threading.Lock()
+    
+    def build(self):
+        from .models import Category, Product
+        
+        version = names_version()
+        names = {
+            (PRODUCT, pk): name
+            for pk, name in Product.objects.filter(is_active=True).values_list('id', 'name')
+        }
+        names.update(
+            ((CATEGORY, pk), name)
+            for pk, name in Category.objects.values_list('id', 'name')
+        )
+        keys = {item: word_keys(name) for item, name in names.items()}
+        starts = KeyArray((item_keys[0], *item) for item, item_keys in keys.items() if item_keys)
+        words = KeyArray((key, *item) for item, item_keys in keys.items() for key in item_keys[1:])
+        
+        with self.lock:
+            self.starts = starts
+            self.words = words
+            self.names = names
+            self.version = version
+    
+    def warm(self):
+        """Monta o índice antes da primeira consulta (subida do servidor)"""
+        try:
+            self.ensure_current()
+        except Exception:
+            # Banco indisponível ao subir: o primeiro uso tenta de novo
+            logger.exception('Falha ao montar o índice do autocomplete')
+    
+    def ensure_current(self):
+        if self.version != names_version():
+            self.build()
+    
+    def _remove(self, item):
+        name = self.names.pop(item, None)
+        if name is None:
+            return
+        keys = word_keys(name)
+        if keys:
+            self.starts.remove((keys[0], *item))
+        for key in keys[1:]:
+            self.words.remove((key, *item))
+    
+    def _add(self, item, name):
+        self.names[item] = name
+        keys = word_keys(name)
+        if keys:
+            self.starts.insert((keys[0], *item))
+        for key in keys[1:]:
+            self.words.insert((key, *item))
+    
+    def update(self, kind, pk, name=None):
+        """
+        Atualiza um item quando a transação confirmar (`name` None remove)
+        Também avança a versão de nomes para os outros processos
+        """
+        def apply():
+            try:
+                version = cache.incr(NAMES_VERSION_KEY)
+            except ValueError:
+                version = None
+            with self.lock:
+                if self.version is None:
+                    return  # índice ainda não montado: o primeiro uso já lê o banco
+                self._remove((kind, pk))
+                if name is not None:
+                    self._add((kind, pk), name)
+                # Se ninguém mais mudou nomes nesse meio tempo, o índice segue atual
+                if version is not None and self.version == version - 1:
+                    self.version = version
+        
+        transaction.on_commit(apply)
+    
+    def suggest(self, prefix, limit=10):
+        """
+        Até `limit` nomes com uma palavra começando por `prefix`
+        Primeiro os nomes que começam pelo prefixo (o nome igual a ele à
+        frente), depois os casados por outra palavra; alfabética em cada
+        grupo. Custo O(log n + limit)
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        self.ensure_current()
+        
+        results = []
+        seen = set()
+        with self.lock:
+            for array in (self.starts, self.words):
+                for _, kind, pk in array.matching(prefix):
+                    if len(results) == limit:
+                        return results
+                    if (kind, pk) not in seen:
+                        seen.add((kind, pk))
+                        results.append({'type': kind, 'id': pk, 'name': self.names[(kind, pk)]})
+        return results
+
+
+def bump_names_version():
+    """Escrita em lote nos nomes: todos os processos reconstroem o índice"""
+    def increment():
+        try:
+            cache.incr(NAMES_VERSION_KEY)
+        except ValueError:
+            names_version()
+            cache.incr(NAMES_VERSION_KEY)
+    
+    transaction.on_commit(increment)
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+from .models import Category, Product
+
+
+class StockSyncTests(TestCase):
+    """Sincronização incremental de estoque (GET /api/products/stock/)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = get_user_model().objects.create_user('cliente', 'cliente@example.com', 'cliente123')
+        category = Category.objects.create(name='Eletrônicos')
+        cls.products = [
+            Product.objects.create(
+                name=f'Produto {index}',
+                description='Descrição',
+                price=10 + index,
+                stock=10,
+                category=category
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def sync(self, **params):
+        response = self.client.get('/api/products/stock/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_deactivated_product_reaches_non_staff_delta(self):
+        version = self.sync()['version']
+        product = self.products[0]
+        product.is_active = False
+        product.save()
+
+        changes = self.sync(since=version)['changes']
+        self.assertIn((product.id, product.stock, False), [tuple(change) for change in changes])
+
+    def test_stock_change_reaches_delta(self):
+        version = self.sync()['version']
+        product = self.products[1]
+        Product.objects.filter(pk=product.pk).update(stock=3)
+
+        changes = self.sync(since=version)['changes']
+        self.assertIn((product.id, 3, True), [tuple(change) for change in changes])
+
+    def test_invalid_since_is_rejected(self):
+        response = self.client.get('/api/products/stock/', {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
@@ -1,13 +1,21 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
+from .cache import CatalogCacheMixin, catalog_cache
 from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer, ProductListSerializer
+from .search import search_products
+from .suggest import suggest_index
+from .serializers import CategorySerializer, ProductSerializer, ProductListSerializer, product_list_rows
+from mercadofree_backend.fastlist import FastListMixin
+from mercadofree_backend.pagination import CreatedAtCursorPagination, RankedPagination
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar categorias
+    Leituras servidas pelo cache do catálogo (apps.products.cache)
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -22,23 +30,43 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar produtos
+    Leituras servidas pelo cache do catálogo (apps.products.cache)
+    Listagem pelo caminho rápido com FAST_LIST_RENDERER (mercadofree_backend.fastlist)
     """
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
+    fast_list_rows = product_list_rows
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_active']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'price', 'created_at']
     
+    @property
+    def search_text(self):
+        """Texto da busca com ranking (?q=), na listagem e nas facetas"""
+        if self.action not in ('list', 'facets'):
+            return ''
+        return self.request.query_params.get('q', '').strip()
+    
+    @property
+    def paginator(self):
+        # Resultados da busca vêm em ordem de relevância, não de created_at
+        if self.search_text and not hasattr(self, '_paginator'):
+            self._paginator = RankedPagination()
+        return super().paginator
+    
     def get_queryset(self):
-        queryset = Product.objects.all()
+        queryset = Product.objects.select_related('category').defer('search_vector')
         # Apenas admins veem produtos inativos
         if not self.request.user.is_staff:
             queryset = queryset.filter(is_active=True)
+        if self.search_text:
+            queryset = search_products(queryset, self.search_text)
         return queryset
     
     def get_serializer_class(self):
@@ -50,3 +78,61 @@ class ProductViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAdminUser()]
         return super().get_permissions()
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """
+        Autocomplete da busca: nomes de produtos e categorias por prefixo
+        GET /api/products/suggest/?prefix=sam&limit=10
+        Servido do índice em memória (apps.products.suggest), sem consultar o banco
+        """
+        prefix = request.query_params.get('prefix', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response(
+                {'error': 'limit deve ser um número inteiro.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'prefix': prefix,
+            'results': suggest_index.suggest(prefix, limit)
+        })
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Contagens para navegação por facetas, com os mesmos filtros da listagem
+        GET /api/products/facets/?category=2&q=samsung
+        Uma consulta agregada, guardada no cache do catálogo por versão
+        """
+        return catalog_cache.respond(
+            request,
+            lambda: Response(self.filter_queryset(self.get_queryset()).facets())
+        )
+    
+    @action(detail=False, methods=['get'])
+    def stock(self, request):
+        """
+        Sincronização incremental de estoque
+        GET /api/products/stock/?since=<versão>&after=<id>
+        Retorna os produtos alterados a partir de `since` como [id, estoque, ativo],
+        até 500 por resposta; o cliente guarda `version` e `after` e envia na
+        próxima consulta, repetindo enquanto `more` for true. Sem `since`,
+        devolve só a versão atual (marque antes de carregar a listagem)
+        Produtos desativados vêm com ativo = false para o cliente removê-los
+        """
+        params = {}
+        for name in ('since', 'after'):
+            if request.query_params.get(name) is None:
+                continue
+            try:
+                params[name] = int(request.query_params[name])
+            except ValueError:
+                return Response(
+                    {'error': f'{name} deve ser um número inteiro.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(Product.objects.stock_changes(**params))
@@ -0,0 +1,80 @@
+"""
+Sincronização adiada e agrupada de contadores fragmentados
+
+Estoque fragmentado (StockShard) e usos fragmentados de cupom
+(CouponUsageShard) guardam uma soma para leitura na linha do produto/cupom.
+Atualizar essa soma a cada checkout volta a disputar a linha quente que os
+fragmentos evitam; em vez disso, os ids alterados são acumulados após o
+commit e uma thread por processo aplica `sync(ids)` no máximo uma vez a
+cada SHARD_SYNC['INTERVAL_MS'] (um único UPDATE para todos os ids).
+
+A soma fica até um intervalo atrasada; a verdade está nos fragmentos. Com
+INTERVAL_MS = 0, a soma é atualizada logo após cada commit.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredSync:
+    """Ids pendentes de `sync(ids)`, aplicados em lote por uma thread"""
+
+    def __init__(self, sync):
+        self.sync = sync
+        self.pending = set()
+        self.thread = None
+        self.lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def interval(self):
+        return settings.SHARD_SYNC['INTERVAL_MS'] / 1000
+
+    def schedule(self, ids):
+        """Agenda a sincronização de `ids` para depois do commit da transação atual"""
+        transaction.on_commit(lambda: self.add(ids))
+
+    def add(self, ids):
+        if not self.interval:
+            self.sync(set(ids))
+            return
+        with self.lock:
+            self.pending.update(ids)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='deferred-sync', daemon=True)
+                self.thread.start()
+
+    def flush(self):
+        """Aplica agora o que estiver pendente (fim do processo, comandos)"""
+        with self.lock:
+            ids, self.pending = self.pending, set()
+        if ids:
+            self.sync(ids)
+
+    def run(self):
+        try:
+            while True:
+                time.sleep(self.interval)
+                with self.lock:
+                    ids, self.pending = self.pending, set()
+                    if not ids:
+                        # Nada chegou no intervalo: a próxima escrita inicia outra thread
+                        self.thread = None
+                        return
+                try:
+                    self.sync(ids)
+                except Exception:
+                    logger.exception('Falha ao sincronizar %d contadores fragmentados', len(ids))
+                    with self.lock:
+                        self.pending.update(ids)
+                finally:
+                    close_old_connections()
+        finally:
+            with self.lock:
+                if self.thread is threading.current_thread():
+                    self.thread = None
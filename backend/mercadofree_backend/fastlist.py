@@ -0,0 +1,285 @@
+"""
+Listagens rápidas: linhas do banco direto para dicts, sem o serializer por objeto
+
+O serializer do DRF monta e percorre uma árvore de campos para cada objeto;
+em listas grandes isso domina o tempo de CPU. RowShape lê os campos de um
+serializer uma única vez, busca só as colunas necessárias com .values() e
+monta cada linha com uma função gerada para aquele serializer.
+
+A saída é a mesma do serializer: campos simples passam pelo mesmo
+to_representation, `get_<campo>_display` vira uma consulta aos choices,
+imagens viram URLs (absolutas com request) e campos atravessando uma FK nula
+são omitidos, como o DRF faz. O que não dá para derivar (SerializerMethodField,
+serializers aninhados, propriedades do modelo) é declarado no RowShape com
+Computed ou Later.
+
+Ligado por FAST_LIST_RENDERER (settings); FastListMixin troca o list() do
+ViewSet mantendo filtros, paginação e formato JSON.
+"""
+import re
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .images import ImageSrcsetField, srcset
+from .renderers import FastJSONRenderer
+
+# to_representation que devolve o próprio valor lido do banco
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    PrimaryKeyRelatedField,
+)
+
+DISPLAY_SOURCE = re.compile(r'^get_(\w+)_display$')
+
+
+class Computed:
+    """
+    Campo calculado a partir de colunas: func(*valores)
+    O resultado passa pelo to_representation do campo do serializer
+    (exceto SerializerMethodField, que é usado como está)
+    """
+
+    def __init__(self, func, *lookups):
+        self.func = func
+        self.lookups = lookups
+
+
+class Later:
+    """Campo preenchido depois de montar as linhas (ex.: listas aninhadas)"""
+
+
+class Column:
+    """Como obter uma chave da saída a partir de uma linha do .values()"""
+
+    def __init__(self, lookups, func=None, convert=None, request=False, omit_if_null=None):
+        self.lookups = lookups
+        self.func = func
+        self.convert = convert
+        self.request = request
+        self.omit_if_null = omit_if_null
+
+
+def file_url(model_field, serializer_field):
+    """Mesmo resultado do FileField/ImageField do DRF, a partir do nome do arquivo"""
+    storage = model_field.storage
+    use_url = getattr(serializer_field, 'use_url', True)
+
+    def url(name, request):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return url
+
+
+class RowShape:
+    """
+    Linhas de um serializer montadas direto do .values()
+    `overrides` mapeia nome do campo -> Computed ou Later
+    """
+
+    def __init__(self, serializer_class, **overrides):
+        self.serializer_class = serializer_class
+        self.overrides = overrides
+        self._shape = None
+        self._lookups = None
+
+    @property
+    def lookups(self):
+        """Colunas do .values() que as linhas precisam"""
+        if self._shape is None:
+            self.compile()
+        return self._lookups
+
+    def row(self, values, request=None):
+        if self._shape is None:
+            self.compile()
+        return self._shape(values, request)
+
+    def rows(self, values, request=None):
+        if self._shape is None:
+            self.compile()
+        shape = self._shape
+        return [shape(row, request) for row in values]
+
+    def compile(self):
+        """Gera a função linha -> dict (uma vez por RowShape)"""
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        columns = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            columns[name] = self.column(model, name, field)
+
+        namespace = {}
+        lookups = {}
+        entries = []
+        omissions = []
+        for position, (name, column) in enumerate(columns.items()):
+            if column is None:
+                entries.append(f'{name!r}: None')
+                continue
+            lookups.update(dict.fromkeys(column.lookups))
+            arguments = [f'r[{lookup!r}]' for lookup in column.lookups]
+            if column.request:
+                arguments.append('request')
+            if column.func is not None:
+                namespace[f'f{position}'] = column.func
+                value = f'f{position}({", ".join(arguments)})'
+            else:
+                value = arguments[0]
+            if column.convert is not None:
+                namespace[f'c{position}'] = column.convert
+                value = f'None if (v := {value}) is None else c{position}(v)'
+            entries.append(f'{name!r}: {value}')
+            if column.omit_if_null:
+                lookups[column.omit_if_null] = None
+                omissions.append((name, column.omit_if_null))
+
+        source = ['def shape(r, request):', '    row = {']
+        source += [f'        {entry},' for entry in entries]
+        source.append('    }')
+        for name, lookup in omissions:
+            source.append(f'    if r[{lookup!r}] is None:')
+            source.append(f'        del row[{name!r}]')
+        source.append('    return row')
+
+        exec(compile('\n'.join(source), f'<RowShape {self.serializer_class.__name__}>', 'exec'), namespace)
+        self._lookups = tuple(lookups)
+        self._shape = namespace['shape']
+
+    def column(self, model, name, field):
+        override = self.overrides.get(name)
+        if isinstance(override, Later):
+            return None
+        if isinstance(override, Computed):
+            convert = None
+            if not isinstance(field, (serializers.SerializerMethodField, *IDENTITY_FIELDS)):
+                convert = field.to_representation
+            return Column(override.lookups, func=override.func, convert=convert)
+
+        if isinstance(field, ImageSrcsetField):
+            prefix = '' if field.source == '*' else f'{field.source.replace(".", "__")}__'
+            return Column(
+                (f'{prefix}{field.image_field}', f'{prefix}{field.image_field}_variants'),
+                func=srcset,
+                request=True
+            )
+
+        if (
+            field.source == '*'
+            or isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer))
+            or (isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField))
+        ):
+            raise ImproperlyConfigured(
+                f'{self.serializer_class.__name__}.{name}: declare Computed ou Later no RowShape'
+            )
+
+        *path, attr = field.source_attrs
+        nullable = None
+        for position, relation_name in enumerate(path):
+            relation = self.model_field(model, name, relation_name)
+            if relation.null:
+                # O DRF omite o campo quando a FK do caminho é nula
+                nullable = '__'.join(path[:position + 1])
+            model = relation.related_model
+        prefix = ''.join(f'{relation_name}__' for relation_name in path)
+
+        display = DISPLAY_SOURCE.match(attr)
+        if display:
+            model_field = self.model_field(model, name, display.group(1))
+            labels = {value: str(label) for value, label in model_field.flatchoices}
+            return Column(
+                (f'{prefix}{model_field.name}',),
+                func=lambda value: labels.get(value, value),
+                omit_if_null=nullable
+            )
+
+        model_field = self.model_field(model, name, attr)
+        lookup = f'{prefix}{attr}'
+        if isinstance(field, serializers.FileField):
+            return Column((lookup,), func=file_url(model_field, field), request=True, omit_if_null=nullable)
+
+        convert = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+        return Column((lookup,), convert=convert, omit_if_null=nullable)
+
+    def model_field(self, model, name, attr):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete:
+            raise ImproperlyConfigured(
+                f'{self.serializer_class.__name__}.{name}: "{attr}" não é coluna de {model.__name__}; '
+                'declare Computed no RowShape'
+            )
+        return model_field
+
+
+def grouped(shape, values, key, request=None):
+    """Linhas de `values` agrupadas pela coluna `key`: {valor: [linhas]}"""
+    groups = {}
+    for row in values:
+        groups.setdefault(row[key], []).append(shape.row(row, request))
+    return groups
+
+
+class FastListMixin:
+    """
+    list() de ViewSet montado pelo RowShape `fast_list_rows`
+    quando FAST_LIST_RENDERER está ligado. Mesmos filtros, paginação e JSON
+    """
+    fast_list_rows = None
+
+    @property
+    def fast_list(self):
+        return (
+            settings.FAST_LIST_RENDERER
+            and self.fast_list_rows is not None
+            and getattr(self, 'action', None) == 'list'
+        )
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.fast_list:
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def finish_fast_list(self, data):
+        """Preenche os campos Later das linhas da página"""
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+
+        # O cursor lê a posição das colunas de ordenação na última linha
+        lookups = dict.fromkeys(self.fast_list_rows.lookups)
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'get_ordering'):
+            lookups.update(
+                (field.lstrip('-'), None)
+                for field in paginator.get_ordering(request, queryset, self)
+            )
+        values = queryset.values(*lookups)
+
+        page = self.paginate_queryset(values)
+        data = self.fast_list_rows.rows(values if page is None else page, request)
+        self.finish_fast_list(data)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
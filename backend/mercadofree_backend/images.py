@@ -0,0 +1,163 @@
+"""
+Derivadas de imagens (miniaturas WebP/JPEG) compartilhadas pelos apps
+
+Ao enviar uma imagem, as derivadas de cada largura de IMAGE_DERIVATIVES são
+geradas com Pillow em um pool de processos, fora da requisição. O campo
+`<campo>_variants` do modelo guarda a imagem de origem e as larguras geradas;
+os serializers expõem um srcset a partir dele (None enquanto não fica pronto).
+
+As derivadas ficam em MEDIA_ROOT/derivatives/, ao lado dos originais
+(requer o armazenamento em sistema de arquivos, o padrão do projeto).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def derivative_name(name, width, extension):
+    """products/foto.png -> derivatives/products/foto_320w.webp"""
+    stem, _ = os.path.splitext(name)
+    return f'derivatives/{stem}_{width}w.{extension}'
+
+
+def render_derivatives(source_path, media_root, name, widths):
+    """
+    Gera as derivadas de uma imagem (roda no pool de processos, sem Django)
+    Não amplia: larguras maiores que a original viram uma única derivada do
+    tamanho original. Retorna as larguras geradas
+    """
+    from PIL import Image, ImageOps
+    
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # JPEG não tem transparência: fundo branco
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        targets = sorted({min(width, image.width) for width in widths})
+        for width in targets:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for extension, image_format, options in FORMATS:
+                path = os.path.join(media_root, derivative_name(name, width, extension))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                resized.save(path, image_format, **options)
+    return targets
+
+
+def derivative_task(name):
+    """Argumentos de render_derivatives para a imagem `name` do armazenamento"""
+    return (
+        default_storage.path(name),
+        str(settings.MEDIA_ROOT),
+        name,
+        settings.IMAGE_DERIVATIVES['WIDTHS'],
+    )
+
+
+def spawn_pool(workers):
+    """Pool de processos novos (spawn): o filho não herda conexões nem threads do Django"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+class DerivativePool:
+    """Pool de processos criado no primeiro uso"""
+    
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+    
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = spawn_pool(self.workers)
+            return self.executor
+    
+    def submit(self, instance, field_name):
+        """
+        Agenda as derivadas de `instance.<field_name>` para depois do commit
+        Ao terminar, grava `<field_name>_variants`, se a imagem ainda for a mesma
+        """
+        model = type(instance)
+        pk = instance.pk
+        name = getattr(instance, field_name).name
+        
+        def save_variants(future):
+            try:
+                widths = future.result()
+                model._default_manager.filter(pk=pk, **{field_name: name}).update(
+                    **{f'{field_name}_variants': {'source': name, 'widths': widths}}
+                )
+            except Exception:
+                # Sem derivadas o serializer continua entregando só o original
+                logger.exception('Falha ao gerar derivadas de %s', name)
+            finally:
+                connection.close()
+        
+        def start():
+            future = self.get_executor().submit(render_derivatives, *derivative_task(name))
+            future.add_done_callback(save_variants)
+        
+        transaction.on_commit(start)
+
+
+derivative_pool = DerivativePool(workers=settings.IMAGE_DERIVATIVES['WORKERS'])
+
+
+def schedule_derivatives(instance, field_name):
+    if getattr(instance, field_name):
+        derivative_pool.submit(instance, field_name)
+
+
+def srcset(name, variants, request=None):
+    """{"webp": "url 160w, ...", "jpeg": "..."} ou None se as derivadas não estão prontas"""
+    if not name or not variants or variants.get('source') != name:
+        return None
+    
+    def url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+    
+    return {
+        'webp' if extension == 'webp' else 'jpeg': ', '.join(
+            f'{url(derivative_name(name, width, extension))} {width}w'
+            for width in variants['widths']
+        )
+        for extension, _, _ in FORMATS
+    }
+
+
+class ImageSrcsetField(serializers.Field):
+    """srcset das derivadas de um ImageField do objeto (ver srcset)"""
+    
+    def __init__(self, image_field, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+        self.image_field = image_field
+    
+    def to_representation(self, instance):
+        return srcset(
+            getattr(instance, self.image_field).name,
+            getattr(instance, f'{self.image_field}_variants'),
+            self.context.get('request')
+        )
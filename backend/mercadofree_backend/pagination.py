@@ -0,0 +1,79 @@
+"""
+Paginação compartilhada pelos apps
+"""
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Pagina por (created_at, id) em ordem decrescente
+    Cada página é um WHERE created_at < cursor LIMIT n: sem COUNT(*) nem OFFSET,
+    então páginas profundas custam o mesmo que a primeira
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    
+    def get_ordering(self, request, queryset, view):
+        """
+        Ordenação pedida (?ordering=price) com id como desempate
+        O cursor guarda a posição na primeira coluna e quantas linhas empatadas
+        já foram lidas; sem uma ordem total, empates pulam ou repetem linhas
+        """
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            return ordering
+        return (*ordering, '-id' if ordering[0].startswith('-') else 'id')
+
+
+class RankedPagination(BasePagination):
+    """
+    Paginação de resultados ordenados por relevância (busca ?q=)
+    A ordem vem do ranking, não de uma coluna, então o cursor não serve:
+    pagina por LIMIT/OFFSET e busca um item a mais para saber se há próxima
+    página, sem COUNT(*)
+    """
+    page_size = 20
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    
+    def get_int(self, request, name, default):
+        try:
+            value = int(request.query_params[name])
+        except (KeyError, ValueError):
+            return default
+        return value if value > 0 else default
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page = self.get_int(request, self.page_query_param, 1)
+        self.size = min(self.get_int(request, self.page_size_query_param, self.page_size), self.max_page_size)
+        
+        offset = (self.page - 1) * self.size
+        results = list(queryset[offset:offset + self.size + 1])
+        self.has_next = len(results) > self.size
+        return results[:self.size]
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page + 1)
+    
+    def get_previous_link(self):
+        url = self.request.build_absolute_uri()
+        if self.page == 1:
+            return None
+        if self.page == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page - 1)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
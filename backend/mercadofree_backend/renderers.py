@@ -0,0 +1,34 @@
+"""
+Renderers compartilhados pelos apps
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer com orjson, mesma saída byte a byte do JSONRenderer padrão
+    (compacto, UTF-8, U+2028/U+2029 escapados). Tipos que o orjson não
+    serializa igual (datas, Decimal, ...) passam pelo encoder do DRF; com
+    indentação pedida ou JSON não compacto/ASCII, usa o JSONRenderer
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            # Chaves não-string, inteiros fora de 64 bits, ...
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -5,6 +5,7 @@ Django settings for mercadofree_backend project.
 from pathlib import Path
 from datetime import timedelta
 import os
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -134,6 +135,78 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Admissão de pedidos em lote (group commit): checkouts que chegam na mesma
+# janela de WINDOW_MS são resolvidos em uma única transação. Só agrupa
+# requisições simultâneas do mesmo processo: com gunicorn, use workers com
+# threads (GUNICORN_CMD_ARGS="--worker-class gthread --threads 16"); com os
+# workers sync padrão cada lote tem um pedido e só soma a espera da janela.
+# Checkout sem resposta em TIMEOUT_MS responde 503
+ORDER_INTAKE = {
+    'BATCHING': os.getenv('ORDER_INTAKE_BATCHING', 'False') == 'True',
+    'WINDOW_MS': int(os.getenv('ORDER_INTAKE_WINDOW_MS', '5')),
+    'MAX_BATCH': int(os.getenv('ORDER_INTAKE_MAX_BATCH', '100')),
+    'TIMEOUT_MS': int(os.getenv('ORDER_INTAKE_TIMEOUT_MS', '10000')),
+}
+
+# Somas dos contadores fragmentados (Product.stock de StockShard e
+# Coupon.used_count de CouponUsageShard): atualizadas em lote no máximo uma
+# vez por intervalo, fora da transação do checkout
+# (mercadofree_backend.deferred); 0 = logo após cada commit
+SHARD_SYNC = {
+    'INTERVAL_MS': int(os.getenv('SHARD_SYNC_INTERVAL_MS', '1000')),
+}
+
+# Pedidos concluídos/cancelados mais antigos que isso vão para o arquivo
+# (python manage.py archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+
+# Cache do Django, compartilhado por todos os processos (gunicorn, expiry-worker,
+# comandos): guarda as versões que invalidam os caches em memória do catálogo,
+# do autocomplete e dos cupons. Redis com REDIS_URL (docker-compose); sem
+# ele, uma tabela no banco (python manage.py createcachetable)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'mercadofree_cache',
+            'TIMEOUT': None,  # só versões: sem expiração
+        }
+    }
+
+# Cache de respostas do catálogo (apps.products.cache)
+CATALOG_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '512')),
+}
+
+# Cache de cupons por código, com filtro de Bloom dos códigos existentes
+# (apps.coupons.cache); a versão usa o mesmo cache compartilhado do catálogo
+# e o filtro é remontado a cada TTL_SECONDS
+COUPON_CACHE = {
+    'TTL_SECONDS': int(os.getenv('COUPON_CACHE_TTL_SECONDS', '60')),
+    'MAX_ENTRIES': int(os.getenv('COUPON_CACHE_MAX_ENTRIES', '1024')),
+}
+
+# Miniaturas WebP/JPEG geradas no upload (mercadofree_backend.images)
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [160, 320, 640],
+    'WORKERS': int(os.getenv('IMAGE_DERIVATIVE_WORKERS', '2')),
+}
+
+# Listagens de produtos e pedidos montadas direto do .values(), sem o
+# serializer por objeto, e renderizadas com orjson (mercadofree_backend.fastlist)
+FAST_LIST_RENDERER = os.getenv('FAST_LIST_RENDERER', 'False') == 'True'
+
+# Validade das chaves do cabeçalho Idempotency-Key (pedidos e pagamentos)
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
@@ -148,3 +221,5 @@ SIMPLE_JWT = {
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['idempotent-replayed']
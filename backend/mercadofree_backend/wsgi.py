@@ -9,3 +9,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mercadofree_backend.settings')
 
 application = get_wsgi_application()
+
+# Autocomplete pronto antes da primeira requisição; só o servidor web
+# (gunicorn, runserver) importa este módulo, migrate e demais comandos não
+from apps.products.suggest import suggest_index  # noqa: E402
+
+suggest_index.warm()
@@ -24,11 +24,19 @@ const ProductCard = ({ product }) => {
       <div className="bg-white rounded-xl shadow-md overflow-hidden hover:shadow-2xl transition-all duration-300 transform hover:-translate-y-1">
         <div className="h-56 bg-gradient-to-br from-gray-100 to-gray-200 flex items-center justify-center p-4">
           {product.image ? (
-            <img
-              src={product.image}
-              alt={product.name}
-              className="w-full h-full object-contain"
-            />
+            <picture className="w-full h-full">
+              {product.image_srcset && (
+                <source type="image/webp" srcSet={product.image_srcset.webp} sizes="320px" />
+              )}
+              <img
+                src={product.image}
+                srcSet={product.image_srcset?.jpeg}
+                sizes="320px"
+                alt={product.name}
+                loading="lazy"
+                className="w-full h-full object-contain"
+              />
+            </picture>
           ) : (
             <div className="text-8xl filter drop-shadow-lg">📱</div>
           )}
@@ -43,7 +43,12 @@ const Cart = () => {
         installments: paymentMethod === 'credit_card' ? installments : 1,
       };
 
-      const orderResponse = await api.post('/orders/', orderData);
+      // Mesma chave em retentativas: o servidor não duplica pedido nem pagamento
+      const checkoutKey = crypto.randomUUID();
+
+      const orderResponse = await api.post('/orders/', orderData, {
+        headers: { 'Idempotency-Key': checkoutKey },
+      });
       const order = orderResponse.data;
 
       // Criar pagamento com o método de pagamento
@@ -52,7 +57,9 @@ const Cart = () => {
         method: paymentMethod,
       };
 
-      const paymentResponse = await api.post('/payments/', paymentData);
+      const paymentResponse = await api.post('/payments/', paymentData, {
+        headers: { 'Idempotency-Key': `${checkoutKey}-payment` },
+      });
       const payment = paymentResponse.data;
 
       if (payment.status === 'approved') {
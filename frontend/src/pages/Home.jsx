@@ -1,25 +1,43 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import api from '../api/axios';
 import ProductCard from '../components/ProductCard';
 
+// Intervalo da sincronização incremental de estoque (ms)
+const STOCK_SYNC_INTERVAL = 10000;
+
 const Home = () => {
   const [products, setProducts] = useState([]);
   const [categories, setCategories] = useState([]);
   const [selectedCategory, setSelectedCategory] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const [loading, setLoading] = useState(true);
+  // Posição da sincronização de estoque: { version, after }
+  const stockCursor = useRef(null);
 
   useEffect(() => {
     fetchProducts();
     fetchCategories();
   }, [selectedCategory, searchTerm]);
 
+  useEffect(() => {
+    fetchSuggestions();
+  }, [searchTerm]);
+
+  useEffect(() => {
+    const interval = setInterval(syncStock, STOCK_SYNC_INTERVAL);
+    return () => clearInterval(interval);
+  }, []);
+
   const fetchProducts = async () => {
     try {
       setLoading(true);
       const params = {};
       if (selectedCategory) params.category = selectedCategory;
-      if (searchTerm) params.search = searchTerm;
+      if (searchTerm) params.q = searchTerm;
+
+      // Marca a versão do estoque antes da primeira lista: o que mudar depois chega pela sincronização
+      if (stockCursor.current === null) await syncStock();
 
       const response = await api.get('/products/', { params });
       setProducts(response.data.results || response.data);
@@ -30,6 +48,45 @@ const Home = () => {
     }
   };
 
+  // Busca só os produtos com estoque alterado (em páginas) e atualiza a lista já carregada
+  const syncStock = async () => {
+    try {
+      const changes = new Map();
+      let more = true;
+      while (more) {
+        const cursor = stockCursor.current;
+        const params = cursor ? { since: cursor.version, after: cursor.after ?? undefined } : {};
+        const response = await api.get('/products/stock/', { params });
+        stockCursor.current = { version: response.data.version, after: response.data.after };
+        response.data.changes.forEach(([id, stock, isActive]) => changes.set(id, { stock, isActive }));
+        more = response.data.more;
+      }
+      if (changes.size === 0) return;
+
+      setProducts((current) => current
+        .filter((product) => changes.get(product.id)?.isActive !== false)
+        .map((product) => (
+          changes.has(product.id) ? { ...product, stock: changes.get(product.id).stock } : product
+        ))
+      );
+    } catch (error) {
+      console.error('Erro ao sincronizar estoque:', error);
+    }
+  };
+
+  const fetchSuggestions = async () => {
+    if (!searchTerm) {
+      setSuggestions([]);
+      return;
+    }
+    try {
+      const response = await api.get('/products/suggest/', { params: { prefix: searchTerm } });
+      setSuggestions(response.data.results);
+    } catch (error) {
+      setSuggestions([]);
+    }
+  };
+
   const fetchCategories = async () => {
     try {
       const response = await api.get('/products/categories/');
@@ -67,8 +124,14 @@ const Home = () => {
                 placeholder="Buscar produtos..."
                 value={searchTerm}
                 onChange={(e) => setSearchTerm(e.target.value)}
+                list="product-suggestions"
                 className="w-full pl-10 pr-4 py-3 border-2 border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-blue-500 transition text-gray-800 bg-white"
               />
+              <datalist id="product-suggestions">
+                {suggestions.map((suggestion) => (
+                  <option key={`${suggestion.type}-${suggestion.id}`} value={suggestion.name} />
+                ))}
+              </datalist>
             </div>
 
             <div className="relative">
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import api from '../api/axios';
 import Toast from '../components/Toast';
 
@@ -12,6 +12,10 @@ const MyOrders = () => {
   const [expandedItems, setExpandedItems] = useState({});
   const [expandedHistory, setExpandedHistory] = useState({});
   const [statusFilter, setStatusFilter] = useState('all');
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Páginas já carregadas: a atualização periódica relê todas, sem voltar à primeira
+  const pagesLoaded = useRef(1);
 
   useEffect(() => {
     fetchOrders();
@@ -28,8 +32,17 @@ const MyOrders = () => {
 
   const fetchOrders = async () => {
     try {
-      const response = await api.get('/orders/my_orders/');
-      setOrders(response.data);
+      const loaded = [];
+      let url = '/orders/my_orders/';
+      let next = null;
+      for (let page = 0; url && page < pagesLoaded.current; page++) {
+        const response = await api.get(url);
+        loaded.push(...(response.data.results || response.data));
+        next = response.data.next || null;
+        url = next;
+      }
+      setOrders(uniqueOrders(loaded));
+      setNextPage(next);
     } catch (err) {
       setError('Erro ao carregar pedidos');
       console.error(err);
@@ -38,6 +51,28 @@ const MyOrders = () => {
     }
   };
 
+  const loadMoreOrders = async () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(nextPage);
+      setOrders(prev => uniqueOrders([...prev, ...response.data.results]));
+      setNextPage(response.data.next || null);
+      pagesLoaded.current += 1;
+    } catch (err) {
+      showNotification('Erro ao carregar mais pedidos', 'error');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Pedidos novos deslocam as páginas: um pedido pode vir em duas delas
+  const uniqueOrders = (list) => {
+    const seen = new Set();
+    return list.filter(order => !seen.has(order.id) && seen.add(order.id));
+  };
+
   const handleCancelOrder = async (orderId) => {
     if (!confirm('Deseja realmente cancelar este pedido? Os produtos serão devolvidos ao estoque.')) {
       return;
@@ -299,7 +334,7 @@ const MyOrders = () => {
             <div className="mt-4 pt-4 border-t-2 border-gray-200">
               <p className="text-sm text-gray-600 font-semibold">
                 📊 {statusFilter === 'all' 
-                  ? `Mostrando todos os ${orders.length} pedido(s)` 
+                  ? (nextPage ? `Mostrando os ${orders.length} pedido(s) mais recentes` : `Mostrando todos os ${orders.length} pedido(s)`)
                   : `Mostrando ${orders.filter(o => o.status === statusFilter).length} de ${orders.length} pedido(s)`
                 }
               </p>
@@ -492,6 +527,8 @@ const MyOrders = () => {
                           {item.product_image ? (
                             <img 
                               src={`http://localhost:8000${item.product_image}`}
+                              srcSet={item.product_image_srcset?.jpeg}
+                              sizes="64px"
                               alt={item.product_name}
                               className="w-16 h-16 object-cover rounded-lg shadow-md border-2 border-gray-300"
                             />
@@ -605,6 +642,18 @@ const MyOrders = () => {
           })}
         </div>
           )}
+
+          {nextPage && (
+            <div className="mt-8 text-center">
+              <button
+                onClick={loadMoreOrders}
+                disabled={loadingMore}
+                className="bg-blue-600 hover:bg-blue-700 text-white font-semibold py-3 px-8 rounded-lg shadow transition disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {loadingMore ? 'Carregando...' : 'Carregar mais pedidos'}
+              </button>
+            </div>
+          )}
         </>
       )}
     </div>
@@ -127,6 +127,7 @@ cmd_status() {
 cmd_migrate() {
     echo_info "Aplicando migrations..."
     docker-compose exec backend python manage.py migrate
+    docker-compose exec backend python manage.py createcachetable
     echo_success "Migrations aplicadas!"
 }
 
@@ -149,6 +150,7 @@ cmd_reset_db() {
         sleep 5
         echo_info "Aplicando migrations..."
         docker-compose exec backend python manage.py migrate
+        docker-compose exec backend python manage.py createcachetable
         echo_success "Banco de dados resetado!"
         echo_warning "Não esqueça de popular com dados de exemplo: ./mercadofree.sh populate"
     else